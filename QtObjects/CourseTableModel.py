@@ -0,0 +1,91 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, pyqtSignal
+
+class CourseTableModel(QAbstractTableModel):
+    """One checkable row per course, checked if the course has a final.
+    The check state lives in the wizard's courses dict, so the view only
+    asks for the rows it draws and a toggle is a single dict update"""
+
+    HEADERS = ['Course', 'Major']
+    # Course name and whether it now has a final
+    finalChanged = pyqtSignal(str, bool)
+
+    def __init__(self):
+        super().__init__()
+        self.names = []
+        self.majors = []
+        self.courses = {}
+        # KEY: Major
+        # VALUE: Rows of its courses
+        self.majorRows = {}
+
+    def setCourses(self, table, courses: dict):
+        """Show the CourseName/Major rows of table, with finals read from and written to courses"""
+        self.beginResetModel()
+        self.names = list(table['CourseName'])
+        self.majors = list(table['Major'])
+        self.courses = courses
+        self.majorRows = {}
+        for row, major in enumerate(self.majors):
+            self.majorRows.setdefault(major, []).append(row)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name = self.names[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name if index.column() == 0 else self.majors[index.row()]
+        if role == Qt.ItemDataRole.CheckStateRole and index.column() == 0:
+            return Qt.CheckState.Checked if self.courses[name] else Qt.CheckState.Unchecked
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == 0:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole or index.column() != 0:
+            return False
+        # The view passes the state as an int
+        self.setFinal(index.row(), Qt.CheckState(value) == Qt.CheckState.Checked)
+        return True
+
+    def setFinal(self, row: int, hasFinal: bool):
+        name = self.names[row]
+        if self.courses[name] != hasFinal:
+            self.courses[name] = hasFinal
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+            self.finalChanged.emit(name, hasFinal)
+
+    def setMajor(self, major: str, hasFinal):
+        """Set every course of major, hasFinal may also be a course name -> bool mapping"""
+        for row in self.majorRows.get(major, []):
+            value = hasFinal if isinstance(hasFinal, bool) else bool(hasFinal[self.names[row]])
+            self.setFinal(row, value)
+
+    def majorOf(self, row: int):
+        return self.majors[row]
+
+class CourseFilterModel(QSortFilterProxyModel):
+    """Case-insensitive filter-as-you-type over course and major"""
+
+    def __init__(self, source):
+        super().__init__()
+        self.setSourceModel(source)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        # Match against every column
+        self.setFilterKeyColumn(-1)
@@ -0,0 +1,43 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+class ScheduleWorker(QThread):
+    """Runs generationStart off the GUI thread so the wizard stays responsive"""
+
+    # Courses placed so far and total courses
+    progress = pyqtSignal(int, int)
+    # Emitted with the output path and run summary once the file has been written
+    succeeded = pyqtSignal(str, str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, enrollment, courses, maxTests: int, maxDays: int, strategy: str, output: str,
+                 improveTime=None):
+        super().__init__()
+        self.enrollment = enrollment
+        self.courses = courses
+        self.maxTests = maxTests
+        self.maxDays = maxDays
+        self.strategy = strategy
+        self.output = output
+        self.improveTime = improveTime
+
+    def run(self):
+        # The scheduler (numpy, pandas, openpyxl) is loaded by the first run, not at startup
+        from old_code import generationStart, GenerationCancelled
+        try:
+            stats = generationStart(self.enrollment, self.courses, self.maxTests, self.maxDays,
+                                    self.strategy, self.output, self.reportProgress,
+                                    improveTime=self.improveTime)
+        except GenerationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(self.output, stats.summary())
+
+    def reportProgress(self, placed: int, total: int):
+        # Cancel button requests an interruption, stop at the next placed course
+        if self.isInterruptionRequested():
+            from old_code import GenerationCancelled
+            raise GenerationCancelled()
+        self.progress.emit(placed, total)
@@ -2,16 +2,20 @@ import json
 import os
 import sys
 
-import numpy as np
-import pandas as pd
 from pathlib import Path
-import regex as re
 
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QFileDialog, QPushButton, QLineEdit, QScrollArea, QWidget, QGridLayout, QFormLayout
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (QFileDialog, QPushButton, QLineEdit, QFormLayout, QComboBox, QProgressBar, QCheckBox,
+                             QTableView, QHeaderView, QAbstractItemView, QMenu)
 
 from QtObjects.WizardPage import WizardPage, WrappedLabel
-from old_code import generationStart
+from QtObjects.ScheduleWorker import ScheduleWorker
+from QtObjects.CourseTableModel import CourseTableModel, CourseFilterModel
+from strategies import STRATEGIES, availableStrategies
+from localSearch import DEFAULT_LIMIT
+
+# numpy, pandas and the scheduler modules are imported by the pages that use
+# them, the first time they do, so the wizard opens without loading them
 
 # Page 1: Introduction
 class Introduction(WizardPage):
@@ -44,24 +48,15 @@ class ImportSchedule(WizardPage):
         # Register filePath field when updated
         self.registerField('filePath*', self.fileNameText, 'text', self.fileNameText.textChanged)
 
-    def getCourses(self, df: pd.DataFrame):
-        """Get courses by dropping unneeded columns, removing labs and SIM classes, and sorting values"""
-        
-        df = df.dropna()
-        df = df[['CourseSection']]
-        # Labs match the below pattern with a Course code, 3 numbers, and an L
-        pattern = r'\w+ \d+L-.*'
-        df = df[~df['CourseSection'].str.contains(pattern)]
-        df = df[~df['CourseSection'].str.contains('SIM')]
-        df = df[~df['CourseSection'].str.contains('CR')]
-        # Remove course sections from string
-        df['CourseSection'] = df['CourseSection'].str.replace(r'-\w*', '', regex=True)
-        return df.drop_duplicates().sort_values(by=['CourseSection'])
-
     def readCSV(self, csv):
-        df = self.getCourses(pd.read_csv(csv, index_col=False))
-        # Save df and filepath to self.wizard() for future access
-        self.wizard().df = df
+        from enrollmentCache import loadEnrollment
+        # Loaded from the on-disk cache when the same file was opened before
+        enrollment = loadEnrollment(csv)
+        # Save parsed enrollment, course list and filepath to self.wizard() for future access
+        # The scheduler reuses the parsed enrollment instead of reading the file again
+        self.wizard().enrollment = enrollment
+        # Course names and majors come from the same parse the scheduler uses
+        self.wizard().df = enrollment.courseTable()
         self.wizard().filePath = csv
         # Debugging
         print(f'File Path Change: {csv}')
@@ -87,66 +82,97 @@ class SelectCourses(WizardPage):
         # Initialize df to compare
         self.filePath = ''
 
-        # Pyinstaller fix to find file path
-        with open(self.resource_path('res/courseFinals.json')) as f:
-            self.courseDefaults = json.load(f)
+        # Read on first initializePage, see defaults()
+        self.courseDefaults = None
+        # Built on first initializePage, only the data is replaced when the file changes
+        self.model = None
+
+    def defaults(self):
+        """Preset finals per major and course from res/courseFinals.json"""
+        if self.courseDefaults is None:
+            # Pyinstaller fix to find file path
+            with open(self.resource_path('res/courseFinals.json')) as f:
+                self.courseDefaults = json.load(f)
+        return self.courseDefaults
+
+    def buildView(self):
+        """Course table with a filter box. Only the visible rows are drawn, so the
+        page stays fast with thousands of courses"""
+        self.layout.addWidget(WrappedLabel('Below is a list of all the classes given this semester. '
+        'Please check the classes that are giving finals. Right-click a course to change its whole major.'))
+
+        self.filterEdit = QLineEdit()
+        self.filterEdit.setPlaceholderText('Filter courses or majors')
+
+        self.model = CourseTableModel()
+        self.model.finalChanged.connect(self.toggleCourse)
+        self.proxy = CourseFilterModel(self.model)
+        self.filterEdit.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.view = QTableView()
+        self.view.setModel(self.proxy)
+        self.view.verticalHeader().hide()
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        # Rows all have the same height, so the view doesn't measure each one
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.showMajorMenu)
+
+        self.estimateLabel = WrappedLabel('')
+        self.estimateTimer = QTimer(self)
+        self.estimateTimer.setSingleShot(True)
+        self.estimateTimer.setInterval(0)
+        self.estimateTimer.timeout.connect(self.updateEstimate)
+        self.addWidgets([self.filterEdit, self.estimateLabel, self.view])
+
+    def showMajorMenu(self, position):
+        """Bulk actions for the major of the course under the cursor"""
+        index = self.proxy.mapToSource(self.view.indexAt(position))
+        if not index.isValid():
+            return
+        from enrollment import defaultFinals
+        major = self.model.majorOf(index.row())
+        defaults = defaultFinals(self.wizard().enrollment, self.defaults())
+
+        menu = QMenu(self.view)
+        menu.addAction(f'Finals for all {major} courses', lambda: self.model.setMajor(major, True))
+        menu.addAction(f'No finals for {major} courses', lambda: self.model.setMajor(major, False))
+        menu.addAction(f'Reset {major} to defaults', lambda: self.model.setMajor(major, defaults))
+        menu.exec(self.view.viewport().mapToGlobal(position))
 
     def initializePage(self):
-        # If there is an updated df, reload the page
+        from enrollment import defaultFinals
+        from incremental import IncrementalScheduler
+        if self.model is None:
+            self.buildView()
+
+        # If there is an updated df, reload the courses
         if self.wizard().filePath != self.filePath:
-            self.resetLayout(self.layout)
             self.filePath = self.wizard().filePath
-
-            self.layout.addWidget(WrappedLabel('Below is a list of all the classes given this semester. '
-            'Please which classes are and arent giving finals by toggling the button for each course.'))
+            self.filterEdit.clear()
 
             # Store selected courses in wizard
-            self.wizard().courses = {}
-
-            # Count rows and columns to display courses in QWidget
-            row = 0
-            column = 0
-            layout = QScrollArea()
-            mainWidget = QWidget()
-            grid = QGridLayout()
-
-            previousMajor = self.getMajor(self.wizard().df['CourseSection'][0])
-
-            for i in self.wizard().df['CourseSection']:
-                # Create clickable button for each course
-                button = QPushButton(i)
-                button.setCheckable(True)
-
-                currentMajor = self.getMajor(i)
-                # Use preset values to determine if course have finals
-                # If no preset, assume no final
-                if currentMajor in self.courseDefaults:
-                    value = self.courseDefaults[currentMajor]
-                    self.wizard().courses[i] = value
-                    button.setChecked(value)
-                else:
-                    self.wizard().courses[i] = False
-
-                # End column before overflow
-                if column == 4 and currentMajor == previousMajor:
-                    column = 0
-                    row += 1
-                elif currentMajor == previousMajor:
-                    column += 1
-                else:
-                    column = 0
-                    row += 1
-                    previousMajor = currentMajor
-                # Connect button to allow changing finals status
-                button.toggled.connect(self.toggleCourses(button.text()))
-                grid.addWidget(button, row, column)
-            
-            mainWidget.setLayout(grid)
-            layout.setWidget(mainWidget)
-            self.widgets.append(layout)
-            
-            # Add widgets to layout
-            self.addWidgets(self.widgets)
+            # Use preset values to determine if course have finals
+            # If no preset, assume no final
+            self.wizard().courses = defaultFinals(self.wizard().enrollment, self.defaults())
+            self.model.setCourses(self.wizard().df, self.wizard().courses)
+
+            # Course records kept in memory, a toggle only places the sections from the toggled course on again
+            self.wizard().scheduler = IncrementalScheduler(self.wizard().enrollment, self.wizard().courses,
+                                                           self.getMaxTests())
+        self.updateEstimate()
+
+    def getMaxTests(self):
+        try:
+            return max(int(getattr(self.wizard(), 'maxTests', 4)), 1)
+        except ValueError:
+            return 4
+
+    def updateEstimate(self):
+        scheduler = self.wizard().scheduler
+        self.estimateLabel.setText(f'Current estimate: <b>{len(scheduler.schedule)} exam slots over '
+                                   f'{scheduler.days} days</b> with {scheduler.maxTests} slots per day.')
 
     # Taken from https://stackoverflow.com/a/13790741
     def resource_path(self, relative_path):
@@ -155,20 +181,19 @@ class SelectCourses(WizardPage):
             # PyInstaller creates a temp folder and stores path in _MEIPASS
             base_path = sys._MEIPASS
         except Exception:
-            base_path = os.path.abspath(".")
+            # Project folder rather than the working directory, the file is read
+            # on first use and the working directory may have changed by then
+            base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
         return os.path.join(base_path, relative_path)
 
-    def getMajor(self, course: str):
-        pattern = r'(\w*) \d{3}'
-        return re.search(pattern, course)[1]
-
-    def toggleCourses(self, course: str):
-        def f():
-            self.wizard().courses[course] = not self.wizard().courses[course]
-            # Debugging
-            print(f'Course Status Change: {course} = {self.wizard().courses[course]}')
-        return f
+    def toggleCourse(self, course: str, hasFinal: bool):
+        # The model already updated wizard().courses
+        self.wizard().scheduler.setCourse(course, hasFinal)
+        # A major's courses change one at a time, the estimate is placed once after all of them
+        self.estimateTimer.start()
+        # Debugging
+        print(f'Course Status Change: {course} = {hasFinal}')
 
 class CustomizeDetails(WizardPage):
     def __init__(self, wizardPages, currentIndex):
@@ -191,6 +216,18 @@ class CustomizeDetails(WizardPage):
             innerLayout.addRow('Max Daily Finals:', self.maxTestsEdit)
             innerLayout.addRow('Max Final Days:', self.maxDaysEdit)
 
+            # Placement strategy, stored by key with a readable label
+            self.strategyBox = QComboBox()
+            for key, name in availableStrategies().items():
+                self.strategyBox.addItem(name, key)
+            self.strategyBox.currentIndexChanged.connect(self.updateMaxVariables)
+            innerLayout.addRow('Scheduling Method:', self.strategyBox)
+
+            # Local search pass after placement, bounded by DEFAULT_LIMIT seconds
+            self.improveBox = QCheckBox(f'Try to shorten the schedule (up to {DEFAULT_LIMIT} s)')
+            self.improveBox.toggled.connect(self.updateMaxVariables)
+            innerLayout.addRow('Improvement:', self.improveBox)
+
             self.maxTestsEdit.textChanged.connect(self.updateMaxVariables)
             self.maxDaysEdit.textChanged.connect(self.updateMaxVariables)
             # Register maxTests and maxDays fields when updated
@@ -199,12 +236,16 @@ class CustomizeDetails(WizardPage):
 
             self.wizard().maxTests = self.maxTestsEdit.text()
             self.wizard().maxDays = self.maxDaysEdit.text()
+            self.wizard().strategy = self.strategyBox.currentData()
+            self.wizard().improve = self.improveBox.isChecked()
             self.layout.addLayout(innerLayout)
         
     def updateMaxVariables(self):
         # Update wizard variables if changed
         self.wizard().maxTests = self.maxTestsEdit.text()
         self.wizard().maxDays = self.maxDaysEdit.text()
+        self.wizard().strategy = self.strategyBox.currentData()
+        self.wizard().improve = self.improveBox.isChecked()
 
 class ReviewInfo(WizardPage):
     def __init__(self, wizardPages, currentIndex):
@@ -222,6 +263,8 @@ class ReviewInfo(WizardPage):
         layout.addRow('Courses With Finals:', label)
         layout.addRow('Max Daily Finals:', WrappedLabel(self.wizard().field('maxTests')))
         layout.addRow('Max Final Days:', WrappedLabel(self.wizard().field('maxDays')))
+        layout.addRow('Scheduling Method:', WrappedLabel(STRATEGIES[self.wizard().strategy]))
+        layout.addRow('Improvement:', WrappedLabel('Local search' if self.wizard().improve else 'None'))
 
         self.layout.addLayout(layout)
         # Stretch layout to prevent text clipping
@@ -233,14 +276,79 @@ class ReviewInfo(WizardPage):
 class GenerateSchedule(WizardPage):
     def __init__(self, wizardPages, currentIndex):
         super().__init__(wizardPages, currentIndex)
+        self.output = 'final_schedule.xlsx'
+        self.worker = None
+        # Finish stays disabled until generation stops
+        self.done = False
 
     def initializePage(self):
-        label = WrappedLabel('Your file has been generated and saved to "final_schedule.xlsx" in this folder.')
-        self.layout.addWidget(label)
+        self.resetLayout(self.layout)
+        self.done = False
+
+        self.statusLabel = WrappedLabel('Generating the finals schedule...')
+        self.progressBar = QProgressBar()
+        self.cancelButton = QPushButton('Cancel')
+        self.cancelButton.clicked.connect(self.cancelGeneration)
+        self.addWidgets([self.statusLabel, self.progressBar, self.cancelButton])
 
         # Generate schedule properties
-        path = self.wizard().filePath
+        enrollment = self.wizard().enrollment
         courses = self.wizard().courses
         maxTests = self.wizard().maxTests
         maxDays = self.wizard().maxDays
-        generationStart(path, courses, int(maxTests), int(maxDays))
+        strategy = self.wizard().strategy
+        improveTime = DEFAULT_LIMIT if self.wizard().improve else None
+
+        # Run the scheduler in a background thread so the wizard doesn't freeze
+        self.worker = ScheduleWorker(enrollment, dict(courses), int(maxTests), int(maxDays), strategy, self.output,
+                                     improveTime)
+        self.worker.progress.connect(self.updateProgress)
+        self.worker.succeeded.connect(self.generationSucceeded)
+        self.worker.failed.connect(self.generationFailed)
+        self.worker.cancelled.connect(self.generationCancelled)
+        # Don't let the thread outlive the wizard if it is closed mid-run
+        self.wizard().finished.connect(self.stopWorker)
+        self.worker.start()
+
+    def isComplete(self):
+        return self.done
+
+    def updateProgress(self, placed: int, total: int):
+        self.progressBar.setMaximum(total)
+        self.progressBar.setValue(placed)
+        if placed == total:
+            self.statusLabel.setText(f'Writing "{self.output}"...')
+            # Placement is done, the spreadsheet write can't be interrupted
+            self.cancelButton.setEnabled(False)
+
+    def generationSucceeded(self, path: str, summary: str):
+        self.statusLabel.setText(f'Your file has been generated and saved to "{path}" in this folder.')
+        # Stage times and counters from the run
+        summaryLabel = WrappedLabel(summary.replace('\n', '<br>'))
+        summaryLabel.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.layout.addWidget(summaryLabel)
+        self.finishGeneration()
+
+    def generationFailed(self, error: str):
+        self.statusLabel.setText('The schedule could not be generated.')
+        self.finishGeneration()
+        self.showErrorPage(f'Schedule generation failed: <b>{error}</b>')
+
+    def generationCancelled(self):
+        self.statusLabel.setText('Schedule generation was cancelled. No file was saved.')
+        self.finishGeneration()
+
+    def cancelGeneration(self):
+        self.cancelButton.setEnabled(False)
+        self.statusLabel.setText('Cancelling...')
+        self.worker.requestInterruption()
+
+    def finishGeneration(self):
+        self.cancelButton.setEnabled(False)
+        self.done = True
+        self.completeChanged.emit()
+
+    def stopWorker(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.requestInterruption()
+            self.worker.wait()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from conflictEngine import MAX_DAILY_EXAMS
+
+def examPairs(slots, enrollment):
+    """Sorted distinct (slot, student) pairs of a schedule as slot * numStudents + student.
+    slots[c] is the timeslot of course id c, -1 for courses left out. Same-time
+    sections sharing a student are one sitting, so pairs are distinct"""
+    slots = np.asarray(slots, dtype=np.int64)
+    pairSlots = np.repeat(slots, np.diff(enrollment.indptr))
+    students = np.asarray(enrollment.indices)
+    placed = pairSlots >= 0
+    return np.unique(pairSlots[placed] * max(enrollment.numStudents, 1) + students[placed])
+
+def slotAnalytics(slots, enrollment, maxTests, maxDays=None, students=False):
+    """Quality figures of the schedule given as a timeslot per course id, from
+    whole-array operations on the student x slot incidence. Cheap enough to run
+    on every candidate of a search. students=True adds the SIDs behind the counts"""
+    slots = np.asarray(slots, dtype=np.int64)
+    n = max(enrollment.numStudents, 1)
+    keys = examPairs(slots, enrollment)
+    slot, student = keys // n, keys % n
+    numSlots = int(slots.max()) + 1 if len(slots) and slots.max() >= 0 else 0
+    numDays = -(-numSlots // maxTests)
+
+    # Students sitting an exam in each slot
+    headcounts = np.bincount(slot, minlength=numSlots)
+
+    # Exams per (day, student), only pairs with at least one exam
+    dayKeys, load = np.unique(slot // maxTests * n + student, return_counts=True)
+    day = dayKeys // n
+    # Row d counts students with 0, 1, 2, ... exams on day d
+    width = int(load.max()) + 1 if len(load) else MAX_DAILY_EXAMS + 1
+    histograms = np.bincount(day * width + load, minlength=numDays * width).reshape(numDays, width)
+    histograms[:, 0] = enrollment.numStudents - histograms[:, 1:].sum(axis=1)
+    doubleDays = np.unique(dayKeys[load >= MAX_DAILY_EXAMS] % n)
+
+    # The same student in the next slot of the same day
+    following = keys + n
+    pos = np.searchsorted(keys, following)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == following[found]
+    backToBack = np.unique(student[found & (slot % maxTests != maxTests - 1)])
+
+    exceeded = maxDays is not None and numDays > maxDays
+    overflow = np.flatnonzero(slots >= maxDays * maxTests) if exceeded else []
+    result = {'students': int(len(np.unique(student))),
+              'backToBack': int(len(backToBack)),
+              'doubleDays': int(len(doubleDays)),
+              'slotHeadcounts': headcounts.tolist(),
+              'dayHistograms': histograms.tolist(),
+              'days': numDays,
+              'maxDays': maxDays,
+              'exceeded': exceeded,
+              'overflow': sorted(str(enrollment.courses[c]) for c in overflow)}
+    if students:
+        result.update(backToBackStudents=np.asarray(enrollment.sids)[backToBack].tolist(),
+                      doubleDayStudents=np.asarray(enrollment.sids)[doubleDays].tolist())
+    return result
+
+def scheduleAnalytics(schedule, enrollment, maxTests, maxDays=None, students=False):
+    """slotAnalytics of a schedule given as course lists per timeslot.
+    Courses of enrollment missing from the schedule are left out"""
+    # KEY: Course name
+    # VALUE: Course ID
+    ids = {course: c for c, course in enumerate(enrollment.courses)}
+    slots = np.full(len(enrollment), -1, dtype=np.int64)
+    for i, slot in enumerate(schedule):
+        for course in slot:
+            slots[ids[course]] = i
+    return slotAnalytics(slots, enrollment, maxTests, maxDays, students)
@@ -0,0 +1,235 @@
+"""Batch scheduling jobs kept in a local SQLite file.
+
+    queue = JobQueue('jobs.sqlite')
+    queue.submit('fall.csv', output='fall.xlsx', maxDays=5, timeLimit=300)
+    queue.submit('spring.csv', finals='res/courseFinals.json', output='spring.xlsx')
+    queue.run(workers=4)
+    queue.jobs()
+
+Jobs run concurrently in a process pool, each one through generationStart.
+Only the process calling run() touches the database, workers just return
+their report.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+# Database used when none is given
+JOBS_ENV = 'FINALS_JOBS_DB'
+DEFAULT_DB = 'finals_jobs.sqlite'
+FINALS_DEFAULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'res', 'courseFinals.json')
+
+# Job states, queued -> running -> one of the others
+QUEUED, RUNNING, DONE, FAILED, TIMEOUT, CANCELLED = 'queued', 'running', 'done', 'failed', 'timeout', 'cancelled'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+)
+"""
+
+def databasePath(path=None):
+    return path or os.environ.get(JOBS_ENV) or DEFAULT_DB
+
+def runJob(spec):
+    """Run one job spec in a worker, returns (status, report or error message).
+    The time limit is checked after every placed course, and the search stages
+    get no more than the time left"""
+    from enrollment import defaultFinals
+    from enrollmentCache import loadEnrollment
+    from exactSolver import DEFAULT_LIMIT
+    from multiStart import DEFAULT_BUDGET
+    from old_code import GenerationCancelled, generationStart
+    from constraints import readConstraints
+    from rooms import readRooms
+
+    limit = spec.get('timeLimit')
+    deadline = time.perf_counter() + limit if limit else None
+
+    def remaining(budget):
+        if deadline is None or budget is None:
+            return budget
+        return min(budget, max(deadline - time.perf_counter(), 0))
+
+    # The searches only stop at their own budget, so it is made explicit to be clamped
+    budget = spec.get('timeBudget')
+    if budget is None:
+        budget = {'multistart': DEFAULT_BUDGET, 'exact': DEFAULT_LIMIT}.get(spec['strategy'])
+
+    def progress(placed, total):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise GenerationCancelled()
+
+    try:
+        enrollment = loadEnrollment(spec['input'], spec.get('cache', True))
+        courses = defaultFinals(enrollment, spec['finals'])
+        rooms = readRooms(spec['rooms']) if spec.get('rooms') else None
+        constraints = None
+        if spec.get('sections') or spec.get('unavailable'):
+            constraints = readConstraints(spec.get('sections'), spec.get('unavailable'))
+        stats = generationStart(enrollment, courses, spec['maxTests'], spec['maxDays'], spec['strategy'],
+                                spec['output'], progress, timeBudget=remaining(budget),
+                                improveTime=spec.get('improveTime') and remaining(spec['improveTime']),
+                                merge=spec.get('merge', False), rooms=rooms, constraints=constraints,
+                                format=spec.get('format'), startDate=spec.get('startDate'),
+                                slotTimes=spec.get('slotTimes'))
+    except GenerationCancelled:
+        return TIMEOUT, f"Stopped after the {limit} s time limit"
+    except Exception as e:
+        return FAILED, f'{type(e).__name__}: {e}'
+    return DONE, stats.report()
+
+class JobQueue:
+    """Scheduling jobs and their results in a SQLite file"""
+
+    def __init__(self, path=None):
+        self.path = databasePath(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def submit(self, input, finals=FINALS_DEFAULTS, maxTests=4, maxDays=4, output=None, strategy='greedy',
+               timeLimit=None, timeBudget=None, improveTime=None, merge=False, cache=True, rooms=None,
+               sections=None, unavailable=None, format=None, startDate=None, slotTimes=None):
+        """Queue a job, returns its id. finals is a courseFinals.json style dict or
+        the path of one, read now so the job doesn't change if the file does.
+        output defaults to the input path with the extension of format (.xlsx),
+        timeLimit (seconds) stops the job, rooms is the path of a rooms CSV (see
+        rooms.readRooms), sections and unavailable the paths of constraint CSVs (see
+        constraints.readConstraints), format, startDate and slotTimes (ISO text) are
+        those of exporters.exportSchedule and the other options those of buildSchedule"""
+        if not isinstance(finals, dict):
+            with open(finals) as f:
+                finals = json.load(f)
+        spec = {'input': os.path.abspath(input),
+                'finals': finals,
+                'maxTests': int(maxTests),
+                'maxDays': int(maxDays),
+                'output': os.path.abspath(output or os.path.splitext(input)[0] + '.' + (format or 'xlsx')),
+                'strategy': strategy,
+                'timeLimit': timeLimit,
+                'timeBudget': timeBudget,
+                'improveTime': improveTime,
+                'merge': merge,
+                'cache': cache,
+                'rooms': rooms and os.path.abspath(rooms),
+                'sections': sections and os.path.abspath(sections),
+                'unavailable': unavailable and os.path.abspath(unavailable),
+                'format': format,
+                'startDate': startDate and str(startDate),
+                'slotTimes': slotTimes}
+        with self.db:
+            cursor = self.db.execute('INSERT INTO jobs (spec, status, submitted) VALUES (?, ?, ?)',
+                                     (json.dumps(spec), QUEUED, time.time()))
+        return cursor.lastrowid
+
+    def job(self, id):
+        """One job as a dict with its spec and result decoded, None if there is no such job"""
+        row = self.db.execute('SELECT * FROM jobs WHERE id = ?', (id,)).fetchone()
+        return self.decode(row) if row else None
+
+    def jobs(self, status=None):
+        """Every job in submission order, optionally only those with status"""
+        if status is None:
+            rows = self.db.execute('SELECT * FROM jobs ORDER BY id')
+        else:
+            rows = self.db.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id', (status,))
+        return [self.decode(row) for row in rows]
+
+    def decode(self, row):
+        job = dict(row)
+        job['spec'] = json.loads(job['spec'])
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        if job['started'] is not None and job['finished'] is not None:
+            job['seconds'] = round(job['finished'] - job['started'], 3)
+        return job
+
+    def cancel(self, id):
+        """Cancel a queued job, False if it already started"""
+        with self.db:
+            cursor = self.db.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                                     (CANCELLED, time.time(), id, QUEUED))
+        return cursor.rowcount == 1
+
+    def retry(self, id, staleAfter=None):
+        """Queue a finished, failed or cancelled job again. A running job may still
+        be in a live run(), so it is only queued again if staleAfter is given and it
+        started more than staleAfter seconds ago, e.g. left by a run() that was killed.
+        False if the job can't be queued again"""
+        # Running jobs started before this are taken as abandoned
+        cutoff = -1 if staleAfter is None else time.time() - staleAfter
+        with self.db:
+            cursor = self.db.execute('UPDATE jobs SET status = ?, started = NULL, finished = NULL, result = NULL, '
+                                     'error = NULL WHERE id = ? AND status != ? AND (status != ? OR started < ?)',
+                                     (QUEUED, id, QUEUED, RUNNING, cutoff))
+        return cursor.rowcount == 1
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it, None if none are queued"""
+        while True:
+            row = self.db.execute('SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1', (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            with self.db:
+                # Another run() may have taken it between the two statements
+                cursor = self.db.execute('UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?',
+                                         (RUNNING, time.time(), row['id'], QUEUED))
+            if cursor.rowcount == 1:
+                return self.job(row['id'])
+
+    def finish(self, id, status, outcome):
+        result, error = (outcome, None) if status == DONE else (None, outcome)
+        with self.db:
+            self.db.execute('UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?',
+                            (status, time.time(), None if result is None else json.dumps(result, default=str),
+                             error, id))
+
+    def run(self, workers=None, progress=None):
+        """Run queued jobs in a process pool until none are left, including jobs
+        queued while running. progress(job) is called with every finished job.
+        Returns the ids of the jobs run"""
+        workers = workers or os.cpu_count() or 1
+        finished = []
+        # Spawned workers start clean, the same on every platform
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            # KEY: Future of a running job
+            # VALUE: Job ID
+            running = {}
+            while True:
+                # Jobs are only claimed when a worker is free, so the rest can still be cancelled
+                while len(running) < workers:
+                    job = self.claim()
+                    if job is None:
+                        break
+                    running[pool.submit(runJob, job['spec'])] = job['id']
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    id = running.pop(future)
+                    try:
+                        status, outcome = future.result()
+                    except Exception as e:
+                        # The worker died, e.g. out of memory
+                        status, outcome = FAILED, f'{type(e).__name__}: {e}'
+                    self.finish(id, status, outcome)
+                    finished.append(id)
+                    if progress:
+                        progress(self.job(id))
+        return finished
@@ -0,0 +1,138 @@
+"""Times each stage of schedule generation on synthetic enrollments.
+
+    python benchmarks/benchScheduler.py --sizes 1000,10000,50000,200000 --strategies greedy,dsatur
+
+Every configuration runs in a fresh process so peak RSS isn't shared between
+runs. Results are appended to a JSON file (one session per invocation) and
+compared against the previous session with the same configurations.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import generateEnrollment, parseRange
+
+def peakRSS():
+    """Peak resident set size of this process in MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def runOnce(config, workdir):
+    import pandas as pd
+
+    from enrollment import COLUMNS, DTYPES, defaultFinals, filterSections, ingestDF, selectFinals
+    from conflictEngine import ConflictEngine
+    from old_code import placeCourses
+    from excelExport import exportExcelStreaming
+
+    path = os.path.join(workdir, f"enrollment-{config['rows']}-{config['seed']}.csv")
+    if not os.path.exists(path):
+        generateEnrollment(path, config['rows'], config['coursesPerStudent'], config['sections'], seed=config['seed'])
+    with open(os.path.join(ROOT, 'res', 'courseFinals.json')) as f:
+        finals = json.load(f)
+
+    stages = {}
+    def stage(name, start):
+        stages[name] = round(time.perf_counter() - start, 4)
+        return time.perf_counter()
+
+    start = time.perf_counter()
+    df = pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, index_col=False)
+    start = stage('load', start)
+    df = filterSections(df)
+    start = stage('clean', start)
+    enrollment = ingestDF(df)
+    start = stage('groups', start)
+    enrollment = selectFinals(enrollment, defaultFinals(enrollment, finals))
+    start = stage('select', start)
+    engine = ConflictEngine(enrollment, config['maxTests'])
+    schedule = placeCourses(engine, enrollment, config['strategy'])
+    start = stage('place', start)
+    exportExcelStreaming(schedule, config['maxTests'], os.path.join(workdir, 'schedule.xlsx'), False, 10)
+    stage('export', start)
+
+    return dict(config,
+                stages=stages,
+                total=round(sum(stages.values()), 4),
+                peakRSS=round(peakRSS(), 1),
+                courses=len(enrollment),
+                students=enrollment.numStudents,
+                slots=len(schedule),
+                days=-(-len(schedule)//config['maxTests']))
+
+def gitCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def configKey(run):
+    return (run['rows'], tuple(run['coursesPerStudent']), run['sections'], run['strategy'], run['seed'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark schedule generation stages')
+    parser.add_argument('--sizes', default='1000,10000,50000,200000', help='Enrollment rows per run')
+    parser.add_argument('--courses-per-student', type=parseRange, default=(3, 5))
+    parser.add_argument('--sections', type=int, default=3)
+    parser.add_argument('--strategies', default='greedy')
+    parser.add_argument('--max-tests', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=os.path.join(ROOT, 'benchmarks', 'results.json'))
+    args = parser.parse_args()
+
+    configs = [{'rows': rows, 'coursesPerStudent': list(args.courses_per_student), 'sections': args.sections,
+                'strategy': strategy, 'maxTests': args.max_tests, 'seed': args.seed}
+               for rows in map(int, args.sizes.split(','))
+               for strategy in args.strategies.split(',')]
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for config in configs:
+            # One fresh process per run so peak RSS and import caches are per run
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                runs.append(pool.submit(runOnce, config, workdir).result())
+
+    sessions = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            sessions = json.load(f)
+    previous = {}
+    for session in sessions:
+        for run in session['runs']:
+            previous[configKey(run)] = run
+
+    print(f"{'rows':>8} {'strategy':>12} {'load':>7} {'clean':>7} {'groups':>7} {'place':>7} {'export':>7} "
+          f"{'total':>7} {'RSS MB':>7} {'slots':>5} {'days':>4}  vs previous")
+    for run in runs:
+        s = run['stages']
+        line = (f"{run['rows']:>8} {run['strategy']:>12} {s['load']:>7.3f} {s['clean']:>7.3f} {s['groups']:>7.3f} "
+                f"{s['place']:>7.3f} {s['export']:>7.3f} {run['total']:>7.3f} {run['peakRSS']:>7.1f} "
+                f"{run['slots']:>5} {run['days']:>4}")
+        old = previous.get(configKey(run))
+        if old:
+            line += f"  {run['total'] - old['total']:+.3f}s {run['slots'] - old['slots']:+d} slots"
+        print(line)
+
+    sessions.append({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'commit': gitCommit(),
+                     'python': platform.python_version(),
+                     'runs': runs})
+    with open(args.output, 'w') as f:
+        json.dump(sessions, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Times wizard startup and checks the scheduler isn't loaded before it is needed.
+
+    python benchmarks/benchStartup.py --runs 5 --max-seconds 1.5
+
+Every run is a fresh interpreter that imports main and builds the wizard with
+all pages (offscreen, no window). Exits with status 1 if a heavy module was
+imported during startup or the median time is over --max-seconds.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the Import and Generate pages may load
+HEAVY = ['numpy', 'pandas', 'regex', 'openpyxl', 'old_code', 'enrollment', 'enrollmentCache', 'excelExport']
+
+# Run in the child process, prints the timings and loaded heavy modules as JSON
+STARTUP = f"""
+import json, sys, time
+start = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+qt = time.perf_counter()
+import main
+imported = time.perf_counter()
+wizard = main.buildWizard(app)
+built = time.perf_counter()
+print(json.dumps({{'qt': qt - start, 'import': imported - qt, 'build': built - imported,
+                  'total': built - start, 'loaded': [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+def runOnce():
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    out = subprocess.run([sys.executable, '-c', STARTUP], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark wizard startup')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=1.5, help='Fail if the median startup is slower')
+    args = parser.parse_args()
+
+    runs = [runOnce() for _ in range(args.runs)]
+    print(f"{'run':>3} {'qt':>7} {'import':>7} {'build':>7} {'total':>7}")
+    for n, run in enumerate(runs):
+        print(f"{n+1:>3} {run['qt']:>7.3f} {run['import']:>7.3f} {run['build']:>7.3f} {run['total']:>7.3f}")
+    median = statistics.median(run['total'] for run in runs)
+    print(f'median {median:.3f} s')
+
+    failed = False
+    loaded = sorted({m for run in runs for m in run['loaded']})
+    if loaded:
+        print(f"Loaded at startup: {', '.join(loaded)}", file=sys.stderr)
+        failed = True
+    if median > args.max_seconds:
+        print(f'Startup {median:.3f} s is over the limit of {args.max_seconds} s', file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Synthetic enrollment CSVs in the registrar's SID / CourseSection / Time Slot format.
+
+    python benchmarks/synthetic.py 50000 enrollment.csv --sections 3 --courses-per-student 3-5
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+RES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'res')
+DAYS = ['M/W/F', 'T/Th', 'M/W']
+HOURS = ['8:00 AM', '9:30 AM', '11:00 AM', '12:30 PM', '2:00 PM', '3:30 PM', '5:00 PM']
+
+def generateEnrollment(path, rows, coursesPerStudent=(3, 5), sections=3, coursesPerMajor=20, seed=0):
+    """Write about `rows` enrollment rows to path. Students mostly take courses in
+    their own major and never take two sections that meet at the same time.
+    Every major also gets a lab, SIM and CR section so the filters have work to do"""
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(RES, 'courseFinals.json')) as f:
+        majors = list(json.load(f))
+    times = [f'{d} {h}' for d in DAYS for h in HOURS]
+
+    # Sections per major as (name, time slot)
+    catalog = []
+    for major in majors:
+        offered = []
+        for number in rng.choice(np.arange(100, 500), coursesPerMajor, replace=False):
+            for s in range(1, rng.integers(1, sections, endpoint=True) + 1):
+                offered.append((f'{major} {number}-{s:02d}', times[rng.integers(len(times))]))
+        offered.append((f'{major} 101L-01', times[0]))
+        offered.append((f'{major} 199-SIM', times[1]))
+        offered.append((f'{major} 110-CR', times[2]))
+        catalog.append(offered)
+    everything = [section for offered in catalog for section in offered]
+
+    low, high = coursesPerStudent
+    written = 0
+    sid = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['SID', 'CourseSection', 'Time Slot'])
+        while written < rows:
+            offered = catalog[rng.integers(len(catalog))]
+            wanted = min(rng.integers(low, high, endpoint=True), rows - written)
+            used = set()
+            # Bounded retries in case the catalog can't fill the schedule
+            for _ in range(wanted * 20):
+                if len(used) == wanted:
+                    break
+                pool = offered if rng.random() < 0.6 else everything
+                course, time = pool[rng.integers(len(pool))]
+                if time not in used:
+                    used.add(time)
+                    writer.writerow([f'{sid:06d}', course, time])
+                    written += 1
+            sid += 1
+    return path
+
+def parseRange(text):
+    low, _, high = text.partition('-')
+    return int(low), int(high or low)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic enrollment CSV')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--courses-per-student', type=parseRange, default=(3, 5), help='e.g. 3-5')
+    parser.add_argument('--sections', type=int, default=3, help='Most sections per course')
+    parser.add_argument('--courses-per-major', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generateEnrollment(args.path, args.rows, args.courses_per_student, args.sections, args.courses_per_major, args.seed)
@@ -0,0 +1,247 @@
+import copy
+
+import numpy as np
+
+# Most exams a single student may take in one day
+MAX_DAILY_EXAMS = 2
+
+def packMask(indices, size):
+    """Pack an array of dense student ids into a Python int bitmask"""
+    bits = np.zeros(size, dtype=bool)
+    bits[indices] = True
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+class CourseRecord:
+    """Read-only data of one course, everything a placement check needs in one lookup"""
+    __slots__ = ('id', 'name', 'time', 'students', 'mask', 'seats', 'forbidden', 'instructors', 'sections')
+
+    def __init__(self, id, name, time, students, mask, seats, forbidden=0, instructors=(), sections=None):
+        # Integer course id in the enrollment
+        self.id = id
+        self.name = name
+        # Class time code
+        self.time = time
+        # Sorted dense student ids and the same students as a bitmask
+        self.students = students
+        self.mask = mask
+        # Room seats it needs, 0 for an online final
+        self.seats = seats
+        # Headcount of each of its sections that needs a room, more than one for a merged node
+        self.sections = (seats,) if sections is None else sections
+        # Bitmask of slots it can't go in and its instructor ids (see constraints)
+        self.forbidden = forbidden
+        self.instructors = instructors
+
+class ConflictEngine:
+    """Keeps per-slot student bitsets and per-day exam counts so placement checks
+    are a bitwise AND and a vectorized compare instead of rebuilding student sets"""
+
+    def __init__(self, enrollment, maxTests: int, rooms=None, constraints=None, sectionSeats=None):
+        self.maxTests = maxTests
+        # Exam rooms (see rooms.Rooms) and the seats of all of them together, None for no room limit
+        self.rooms = rooms
+        self.capacity = None if rooms is None else rooms.total
+        # Headcounts of the sections behind each course id that need a room, None for
+        # one section of the course's seats each (see sectionMerge)
+        self.sectionSeats = sectionSeats
+        # Compiled CourseConstraints, None if there are none
+        self.constraints = constraints
+        self.enrollment = enrollment
+        self.numStudents = enrollment.numStudents
+
+        # Record per course id
+        self.records = [CourseRecord(c, course, enrollment.times[c], enrollment.studentsOf(c),
+                                     packMask(enrollment.studentsOf(c), self.numStudents),
+                                     len(enrollment.studentsOf(c)))
+                        for c, course in enumerate(enrollment.courses)]
+        if constraints is not None:
+            for record in self.records:
+                record.seats = int(constraints.seats[record.id])
+                record.forbidden = constraints.forbidden[record.id]
+                record.instructors = constraints.instructors[record.id]
+        for record in self.records:
+            if sectionSeats is not None:
+                record.sections = tuple(int(seats) for seats in sectionSeats[record.id] if seats)
+            else:
+                record.sections = (record.seats,) if record.seats else ()
+        # KEY: Course name
+        # VALUE: Its record
+        self.byName = {record.name: record for record in self.records}
+        self.clear()
+
+    def clear(self):
+        """Remove every placed course and reset the counters"""
+        # An array of exams, each index represents 1 timeslot
+        self.schedule = []
+        # Timeslot of every course id, -1 while unplaced
+        self.slots = np.full(len(self.records), -1, dtype=np.intp)
+        # Union of students and set of class times in each timeslot
+        self.slotMasks = []
+        self.slotTimes = []
+        # Slots where same-time sections already share a student
+        self.slotRepeats = []
+        # Students seated in each timeslot, checked against capacity
+        self.slotSeats = []
+        # Slots each instructor proctors in, as a bitmask per instructor id
+        self.instructorSlots = [0] * (0 if self.constraints is None else self.constraints.numInstructors)
+        # Exams per day (row) per dense student id (column). Rows are allocated
+        # ahead in doubling steps, numDays of them are in use
+        self.dayLoad = np.zeros((0, self.numStudents), dtype=np.uint8)
+        self.numDays = 0
+
+        # Instrumentation counters: conflict checks run and slots probed per course id
+        self.checks = 0
+        self.probes = [0] * len(self.records)
+
+    def empty(self):
+        """New engine with nothing placed, sharing this engine's read-only course data"""
+        engine = copy.copy(self)
+        engine.clear()
+        return engine
+
+    def record(self, course):
+        return self.byName[course]
+
+    def slotOf(self, course):
+        """Timeslot course is placed in, None while unplaced"""
+        i = self.slots[self.byName[course].id]
+        return None if i < 0 else int(i)
+
+    def growTo(self, i):
+        """Open empty timeslots (and days) up to and including index i"""
+        while len(self.schedule) <= i:
+            self.schedule.append([])
+            self.slotMasks.append(0)
+            self.slotTimes.append(set())
+            self.slotRepeats.append(False)
+            self.slotSeats.append(0)
+        days = i // self.maxTests + 1
+        if days > len(self.dayLoad):
+            grown = np.zeros((max(days, 2 * len(self.dayLoad)), self.numStudents), dtype=np.uint8)
+            grown[:len(self.dayLoad)] = self.dayLoad
+            self.dayLoad = grown
+        self.numDays = max(self.numDays, days)
+
+    def studentConflict(self, course, i):
+        """True if any student in course already has the max exams on the day of slot i"""
+        self.growTo(i)
+        self.checks += 1
+        students = self.byName[course].students
+        return bool((self.dayLoad[i // self.maxTests, students] >= MAX_DAILY_EXAMS).any())
+
+    def differentTime(self, course, i):
+        """True if any course already in slot i meets at a different class time"""
+        self.growTo(i)
+        return bool(self.slotTimes[i] - {self.byName[course].time})
+
+    def repeatedStudents(self, course, i):
+        """True if any student would have two exams in slot i once course is added"""
+        self.growTo(i)
+        self.checks += 1
+        return self.slotRepeats[i] or self.slotMasks[i] & self.byName[course].mask != 0
+
+    def overCapacity(self, course, i):
+        """True if the rooms can't seat slot i's students once course is added: too few
+        seats or rooms in total, or no room for a section when every section gets
+        its own rooms as rooms.allocateRooms gives them"""
+        record = self.byName[course]
+        if self.capacity is None or not record.sections:
+            return False
+        self.growTo(i)
+        if self.slotSeats[i] + record.seats > self.capacity:
+            return True
+        headcounts = [seats for other in self.schedule[i] for seats in self.byName[other].sections]
+        return not self.rooms.fits(headcounts + list(record.sections))
+
+    def unavailable(self, course, i):
+        """True if slot i is ruled out for course, or one of its instructors already
+        proctors an exam in it"""
+        if self.constraints is None:
+            return False
+        record = self.byName[course]
+        blocked = record.forbidden
+        for instructor in record.instructors:
+            blocked |= self.instructorSlots[instructor]
+        return blocked >> i & 1 == 1
+
+    def canPlace(self, course, i):
+        """Same acceptance rule as the original greedy: no student over the daily limit,
+        and either every course in the slot meets at the same time or no student repeats.
+        With rooms the slot's rooms must also seat everyone, and with
+        constraints the slot must be open to the course and its instructors.
+        The room allocation is the costliest check, so it runs last"""
+        if self.unavailable(course, i) or self.studentConflict(course, i):
+            return False
+        if self.differentTime(course, i) and self.repeatedStudents(course, i):
+            return False
+        return not self.overCapacity(course, i)
+
+    def place(self, course, i):
+        """Add course to slot i and update slot and day occupancy"""
+        self.growTo(i)
+        record = self.byName[course]
+        self.schedule[i].append(course)
+        self.slots[record.id] = i
+        if self.slotMasks[i] & record.mask:
+            self.slotRepeats[i] = True
+        self.slotMasks[i] |= record.mask
+        self.slotTimes[i].add(record.time)
+        self.slotSeats[i] += record.seats
+        for instructor in record.instructors:
+            self.instructorSlots[instructor] |= 1 << i
+        self.dayLoad[i // self.maxTests, record.students] += 1
+
+    def remove(self, course):
+        """Take course out of its slot and release its students' exam counts"""
+        record = self.byName[course]
+        i = int(self.slots[record.id])
+        self.slots[record.id] = -1
+        self.schedule[i].remove(course)
+        self.slotSeats[i] -= record.seats
+        for instructor in record.instructors:
+            self.instructorSlots[instructor] &= ~(1 << i)
+        self.dayLoad[i // self.maxTests, record.students] -= 1
+
+        # Rebuild the slot's union from the courses left, the removed students
+        # may still be shared with another same-time section
+        mask = 0
+        repeats = False
+        times = set()
+        for other in self.schedule[i]:
+            other = self.byName[other]
+            if mask & other.mask:
+                repeats = True
+            mask |= other.mask
+            times.add(other.time)
+        self.slotMasks[i] = mask
+        self.slotRepeats[i] = repeats
+        self.slotTimes[i] = times
+        return i
+
+    def trim(self):
+        """Drop empty timeslots (and days) left at the end of the schedule"""
+        while self.schedule and not self.schedule[-1]:
+            self.schedule.pop()
+            self.slotMasks.pop()
+            self.slotTimes.pop()
+            self.slotRepeats.pop()
+            self.slotSeats.pop()
+        # Rows of dropped days are all zero again, they stay allocated for reuse
+        self.numDays = -(-len(self.schedule) // self.maxTests)
+
+    def backToBack(self):
+        """Number of students with exams in two consecutive slots of the same day"""
+        students = 0
+        for i in range(len(self.schedule) - 1):
+            if i % self.maxTests != self.maxTests - 1:
+                students |= self.slotMasks[i] & self.slotMasks[i + 1]
+        return students.bit_count()
+
+    def firstFit(self, course, start=0):
+        """Place course in the earliest acceptable slot at or after start, returns the slot"""
+        index = start
+        while not self.canPlace(course, index):
+            index += 1
+        self.probes[self.byName[course].id] += index - start + 1
+        self.place(course, index)
+        return index
@@ -0,0 +1,111 @@
+import heapq
+
+import numpy as np
+
+def conflictEdges(enrollment):
+    """Every pair of courses sharing a student and the number of students they share.
+    This is the off-diagonal of the student x course incidence product"""
+    n = len(enrollment)
+    sizes = np.diff(enrollment.indptr)
+
+    # Sparse incidence as (course, student) pairs, grouped by student
+    courseIds = np.repeat(np.arange(n), sizes)
+    studentIds = np.asarray(enrollment.indices)
+    order = np.argsort(studentIds, kind='stable')
+    studentIds = studentIds[order]
+    courseIds = courseIds[order]
+
+    # Pair each enrollment with the ones d rows later that belong to the same student
+    pairs = []
+    d = 1
+    while d < len(studentIds):
+        same = studentIds[d:] == studentIds[:-d]
+        if not same.any():
+            break
+        a = courseIds[:-d][same]
+        b = courseIds[d:][same]
+        pairs.append(np.minimum(a, b) * n + np.maximum(a, b))
+        d += 1
+    edges, weights = (np.unique(np.concatenate(pairs), return_counts=True)
+                      if pairs else (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)))
+    # Duplicate enrollment rows pair a course with itself
+    keep = edges // n != edges % n
+    edges = edges[keep]
+    edges = np.stack([edges // n, edges % n], axis=1) if n else np.empty((0, 2), dtype=np.intp)
+    return edges, weights[keep]
+
+class ConflictGraph:
+    """Course x course conflict graph, built once from the student x course incidence.
+    Two courses are adjacent if they share at least one student"""
+
+    def __init__(self, enrollment, edges=None, weights=None):
+        # Node i of the graph is course id i of the enrollment
+        self.courses = enrollment.courses
+        self.sizes = np.diff(enrollment.indptr)
+        n = len(self.courses)
+
+        # Edge list of node pairs and the number of students each pair shares,
+        # passed in when they come from the cache or a parent graph
+        if edges is None:
+            edges, weights = conflictEdges(enrollment)
+        self.edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+        self.weights = np.asarray(weights)
+
+        # CSR adjacency lists
+        heads = np.concatenate([self.edges[:, 0], self.edges[:, 1]])
+        tails = np.concatenate([self.edges[:, 1], self.edges[:, 0]])
+        order = np.argsort(heads, kind='stable')
+        self.indptr = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(heads, minlength=n), out=self.indptr[1:])
+        self.adjacency = tails[order]
+        self.degree = np.diff(self.indptr)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def neighbors(self, node):
+        return self.adjacency[self.indptr[node]:self.indptr[node + 1]]
+
+def colorGraph(graph, engine, strategy='dsatur', progress=None):
+    """Assign each course to a slot with a graph coloring heuristic.
+    'dsatur' always colors the course with the most distinct neighbor slots next,
+    'welsh-powell' colors in fixed order of decreasing degree.
+    A slot is usable if no neighbor is in it, no student hits the daily exam limit,
+    the engine's rooms still seat everyone and its constraints allow it.
+    progress(placed, total) is called after every colored course"""
+
+    # Slots already taken by each node's neighbors (saturation set)
+    neighborSlots = [set() for _ in range(len(graph))]
+    colored = np.zeros(len(graph), dtype=bool)
+    placed = 0
+
+    # Ties are broken by degree, then enrollment, then the original popularity order
+    heap = [(0, -int(graph.degree[v]), -int(graph.sizes[v]), v) for v in range(len(graph))]
+    heapq.heapify(heap)
+
+    while heap:
+        saturation, _, _, node = heapq.heappop(heap)
+        # Skip stale heap entries left behind by saturation updates
+        if colored[node] or (strategy == 'dsatur' and -saturation != len(neighborSlots[node])):
+            continue
+
+        course = graph.courses[node]
+        index = 0
+        while (index in neighborSlots[node] or engine.unavailable(course, index)
+               or engine.studentConflict(course, index) or engine.overCapacity(course, index)):
+            index += 1
+        engine.probes[node] += index + 1
+        engine.place(course, index)
+        colored[node] = True
+        placed += 1
+        if progress:
+            progress(placed, len(graph))
+
+        for other in graph.neighbors(node):
+            if not colored[other] and index not in neighborSlots[other]:
+                neighborSlots[other].add(index)
+                if strategy == 'dsatur':
+                    heapq.heappush(heap, (-len(neighborSlots[other]), -int(graph.degree[other]),
+                                          -int(graph.sizes[other]), other))
+
+    return engine.schedule
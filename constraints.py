@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+# Values of the Online column read as true
+ONLINE_VALUES = {'1', 'true', 'yes', 'y', 'online'}
+
+class SectionConstraints:
+    """Optional constraint inputs by name, before they are tied to an enrollment"""
+
+    def __init__(self, instructors=None, online=None, unavailable=None):
+        # KEY: Course section (e.g. CS 101-01) or course (CS 101)
+        # VALUE: Its instructors
+        self.instructors = instructors or {}
+        # Course sections or courses with online finals
+        self.online = set(online or ())
+        # KEY: Instructor
+        # VALUE: (day, slot) pairs they can't proctor, 0-based, slot None for the whole day
+        self.unavailable = unavailable or {}
+
+def readConstraints(sections=None, unavailable=None):
+    """SectionConstraints from a CSV of sections with CourseSection and optional
+    Instructor (several separated by ;) and Online columns, and a CSV of
+    Instructor, Day and optional Slot (1-based, empty for the whole day)"""
+    constraints = SectionConstraints()
+    if sections:
+        df = pd.read_csv(sections, dtype=str, skipinitialspace=True).fillna('')
+        if 'CourseSection' not in df.columns:
+            raise ValueError(f'{sections} is missing the column CourseSection')
+        for row in df.itertuples(index=False):
+            section = row.CourseSection.strip()
+            if 'Instructor' in df.columns and row.Instructor.strip():
+                constraints.instructors[section] = tuple(name.strip() for name in row.Instructor.split(';')
+                                                         if name.strip())
+            if 'Online' in df.columns and row.Online.strip().lower() in ONLINE_VALUES:
+                constraints.online.add(section)
+    if unavailable:
+        df = pd.read_csv(unavailable, dtype=str, skipinitialspace=True).fillna('')
+        missing = [column for column in ('Instructor', 'Day') if column not in df.columns]
+        if missing:
+            raise ValueError(f"{unavailable} is missing the column(s) {', '.join(missing)}")
+        for row in df.itertuples(index=False):
+            slot = getattr(row, 'Slot', '').strip()
+            day, slot = int(row.Day) - 1, int(slot) - 1 if slot else None
+            if day < 0 or (slot is not None and slot < 0):
+                raise ValueError(f'{unavailable}: days and slots start at 1')
+            constraints.unavailable.setdefault(row.Instructor.strip(), []).append((day, slot))
+    return constraints
+
+class CourseConstraints:
+    """Constraints compiled per course id of one enrollment, so a placement check
+    is a mask test: forbidden[c] has bit i set if course c can't go in slot i,
+    and each instructor's occupied slots are a bitmask kept by the engine"""
+
+    def __init__(self, forbidden, instructors, online, seats, numInstructors):
+        # Slot bitmask per course id, slots past the highest bit are always allowed
+        self.forbidden = forbidden
+        # Instructor ids per course id
+        self.instructors = instructors
+        # Online finals need no room and don't count against the seats of a slot
+        self.online = online
+        self.seats = seats
+        self.numInstructors = numInstructors
+
+    def combine(self, members):
+        """Constraints of a merged enrollment, members[g] are the course ids of node g"""
+        forbidden = []
+        for m in members:
+            mask = 0
+            for c in m:
+                mask |= self.forbidden[c]
+            forbidden.append(mask)
+        return CourseConstraints(forbidden,
+                                 [tuple(sorted({i for c in m for i in self.instructors[c]})) for m in members],
+                                 np.array([self.online[m].all() for m in members], dtype=bool),
+                                 np.array([self.seats[m].sum() for m in members], dtype=np.int64),
+                                 self.numInstructors)
+
+def compileConstraints(enrollment, constraints, maxTests):
+    """CourseConstraints of enrollment. Entries may name a section or a whole
+    course, a section's own entry wins"""
+    def lookup(table, c):
+        section, course = str(enrollment.courses[c]), str(enrollment.names[c])
+        return table.get(section, table.get(course, ()))
+
+    instructors = [lookup(constraints.instructors, c) for c in range(len(enrollment))]
+    # KEY: Instructor
+    # VALUE: Instructor ID
+    ids = {name: i for i, name in enumerate(sorted({name for names in instructors for name in names}))}
+
+    # Slots each instructor can't proctor
+    blocked = [0] * len(ids)
+    for name, times in constraints.unavailable.items():
+        if name not in ids:
+            continue
+        for day, slot in times:
+            if slot is None:
+                blocked[ids[name]] |= ((1 << maxTests) - 1) << (day * maxTests)
+            elif 0 <= slot < maxTests:
+                blocked[ids[name]] |= 1 << (day * maxTests + slot)
+
+    forbidden = []
+    for names in instructors:
+        mask = 0
+        for name in names:
+            mask |= blocked[ids[name]]
+        forbidden.append(mask)
+
+    onlineTable = dict.fromkeys(constraints.online, True)
+    online = np.array([bool(lookup(onlineTable, c)) for c in range(len(enrollment))], dtype=bool)
+    seats = np.where(online, 0, np.diff(enrollment.indptr))
+    return CourseConstraints(forbidden, [tuple(ids[name] for name in names) for names in instructors],
+                             online, seats, len(ids))
@@ -0,0 +1,254 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from conflictGraph import ConflictGraph
+from instrumentation import Instrumentation
+
+# Columns the scheduler needs from the registrar export
+COLUMNS = ['SID', 'CourseSection', 'Time Slot']
+DTYPES = {column: 'category' for column in COLUMNS}
+
+# Sections matching any of these never get a final exam:
+# labs (course code, 3 numbers and an L), SIM and CR sections
+SECTION_FILTERS = [r'\w+ \d+L-.*', 'SIM', 'CR']
+# Course name without the section number
+COURSE_PATTERN = r'(\w* \d{3})'
+# Rows parsed at a time by streamEnrollment
+CHUNK_ROWS = 500_000
+
+EXCLUDED_REGEX = re.compile('|'.join(SECTION_FILTERS))
+COURSE_REGEX = re.compile(COURSE_PATTERN)
+
+def parseSection(section):
+    """Course name, major and whether the section is excluded (lab, SIM or CR)
+    for one CourseSection value, e.g. 'CS 101-01' -> ('CS 101', 'CS', False)"""
+    match = COURSE_REGEX.search(section)
+    name = match[1] if match else ''
+    return name, name.split(' ')[0], EXCLUDED_REGEX.search(section) is not None
+
+def sectionInfo(sections):
+    """parseSection for every distinct section, as a DataFrame indexed by section"""
+    return pd.DataFrame([parseSection(section) for section in sections],
+                        index=pd.Index(sections, dtype=object), columns=['CourseName', 'Major', 'Excluded'])
+
+def dropSections(df):
+    """Drop incomplete rows, labs, SIM and CR sections. The patterns run once per
+    distinct section and the result is broadcast to the rows by categorical code.
+    Returns the rows kept, the sectionInfo of the column's categories and the
+    category code of each kept row, an index into that sectionInfo"""
+    df = df.dropna()
+    sections = df['CourseSection'].astype('category').cat
+    info = sectionInfo(sections.categories)
+    keep = ~info['Excluded'].to_numpy()[sections.codes]
+    return df[keep], info, sections.codes.to_numpy()[keep]
+
+def filterSections(df):
+    """Drop incomplete rows, labs, SIM and CR sections and add the CourseName column"""
+    df, info, codes = dropSections(df)
+    return df.assign(CourseName=info['CourseName'].to_numpy()[codes])
+
+def isParquet(path):
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+def readEnrollment(path, instrumentation=None):
+    """Parse an enrollment CSV (or Parquet file) once, keeping only the needed columns as categoricals"""
+    stats = instrumentation or Instrumentation()
+    with stats.stage('read'):
+        if isParquet(path):
+            # Needs pyarrow or fastparquet
+            df = pd.read_parquet(path, columns=COLUMNS).astype(DTYPES)
+        else:
+            df = pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, index_col=False)
+    with stats.stage('filter'):
+        return filterSections(df)
+
+class Enrollment:
+    """Integer-encoded enrollment. Courses are numbered most popular first and
+    students get dense ids, with a CSR index from each course to its students"""
+
+    def __init__(self, courses, times, timeSlots, sids, indptr, indices, names, rows, firstSeen, graph=None):
+        # Course section name per course id
+        self.courses = courses
+        # Course name without the section (e.g. CS 101) per course id
+        self.names = names
+        # Class time code per course id, timeSlots holds the label for each code
+        self.times = times
+        self.timeSlots = timeSlots
+        # SID per dense student id
+        self.sids = sids
+        # Students of course c are indices[indptr[c]:indptr[c + 1]]
+        self.indptr = indptr
+        self.indices = indices
+        # Enrollment rows and order of first appearance in the CSV per course id,
+        # kept so a subset can be ranked exactly like a fresh ingest
+        self.rows = rows
+        self.firstSeen = firstSeen
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.courses)
+
+    @property
+    def numStudents(self):
+        return len(self.sids)
+
+    def studentsOf(self, c):
+        """Sorted dense student ids enrolled in course id c"""
+        return self.indices[self.indptr[c]:self.indptr[c + 1]]
+
+    def courseTable(self):
+        """Distinct course names and their majors, sorted by name, for choosing
+        which courses have finals. Sections without a course name are left out"""
+        names = sorted(name for name in pd.unique(np.asarray(self.names, dtype=object)) if name)
+        return pd.DataFrame({'CourseName': names, 'Major': [parseSection(name)[1] for name in names]})
+
+    def conflictGraph(self):
+        """Course conflict graph, built on first use (or loaded from the cache)"""
+        if self.graph is None:
+            self.graph = ConflictGraph(self)
+        return self.graph
+
+    def subset(self, ids):
+        """Enrollment of only the given course ids, in that order. Student ids are kept"""
+        ids = np.asarray(ids, dtype=np.intp)
+        sizes = np.diff(self.indptr)[ids]
+        indptr = np.zeros(len(ids) + 1, dtype=np.intp)
+        np.cumsum(sizes, out=indptr[1:])
+        # Position of every kept enrollment in the old CSR index
+        gather = np.repeat(self.indptr[ids] - indptr[:-1], sizes) + np.arange(indptr[-1])
+
+        graph = None
+        if self.graph is not None:
+            # Keep the edges between kept courses instead of recomputing them
+            remap = np.full(len(self), -1, dtype=np.intp)
+            remap[ids] = np.arange(len(ids))
+            edges = remap[self.graph.edges]
+            keep = (edges >= 0).all(axis=1)
+            graph = (edges[keep], self.graph.weights[keep])
+
+        enrollment = Enrollment(self.courses[ids], self.times[ids], self.timeSlots, self.sids, indptr,
+                                self.indices[gather], self.names[ids], self.rows[ids], self.firstSeen[ids])
+        if graph is not None:
+            enrollment.graph = ConflictGraph(enrollment, *graph)
+        return enrollment
+
+def selectFinals(enrollment, courses):
+    """Sections whose course has a final, ranked by popularity exactly as if only
+    their rows had been read from the CSV"""
+    return enrollment.subset(finalsOrder(enrollment, courses))
+
+def finalsOrder(enrollment, courses):
+    """Ids of the sections selectFinals keeps, in its order"""
+    filter = {key for key, value in courses.items() if value}
+    selected = np.flatnonzero([str(name) in filter for name in enrollment.names])
+    # Order of first appearance, then the same enrollment sort ingestDF uses
+    selected = selected[np.argsort(enrollment.firstSeen[selected], kind='stable')]
+    popularity = (pd.Series(enrollment.rows[selected])
+                  .sort_values(ascending=False)
+                  .index.to_numpy())
+    return selected[popularity]
+
+def defaultFinals(enrollment, finals):
+    """Map every course name to whether it has a final, using a finals list in the
+    res/courseFinals.json format. Keys are majors, a full course name overrides its major"""
+    courses = {}
+    for course in pd.unique(np.asarray(enrollment.names)):
+        # Sections without a recognizable course name
+        if not course:
+            continue
+        course = str(course)
+        major = course.split(' ')[0]
+        courses[course] = bool(finals.get(course, finals.get(major, False)))
+    return courses
+
+def intern(table, values):
+    """Ids of values in table, values not seen before get the next ids in order"""
+    return np.fromiter((table.setdefault(value, len(table)) for value in values), dtype=np.intp, count=len(values))
+
+def encodeEnrollment(courseNames, rows, courseCodes, sidCodes, sids, timeCodes, timeLabels):
+    """Enrollment from rows already reduced to integer codes.
+    courseNames and sids are in order of first appearance, rows counts the
+    enrollment rows of every course, courseCodes/sidCodes are (course, student)
+    pairs and courseCodes/timeCodes index timeLabels for the times of each course"""
+    courseNames = np.asarray(courseNames, dtype=object)
+
+    # Array of most popular courses (most enrollment rows), ranked exactly as before
+    popularity = (pd.Series(rows)
+                  .sort_values(ascending=False)
+                  .index.to_numpy())
+    rank = np.empty(len(courseNames), dtype=np.intp)
+    rank[popularity] = np.arange(len(courseNames))
+
+    # A course listed at several times keeps the last one in sorted order
+    order = np.argsort(timeLabels, kind='stable')
+    timeRank = np.empty(len(timeLabels), dtype=np.intp)
+    timeRank[order] = np.arange(len(timeLabels))
+    times = np.full(len(courseNames), -1, dtype=np.intp)
+    np.maximum.at(times, rank[timeCodes[0]], timeRank[timeCodes[1]])
+
+    # Unique (course, student) pairs sorted by course, then student
+    numStudents = max(len(sids), 1)
+    pairs = np.unique(rank[courseCodes].astype(np.int64) * numStudents + sidCodes)
+    indices = (pairs % numStudents).astype(np.intp)
+    indptr = np.zeros(len(courseNames) + 1, dtype=np.intp)
+    np.cumsum(np.bincount(pairs // numStudents, minlength=len(courseNames)), out=indptr[1:])
+
+    # The course name only depends on the section name
+    names = np.array([parseSection(section)[0] for section in courseNames[popularity]], dtype=object)
+
+    return Enrollment(courseNames[popularity], times, np.asarray(timeLabels, dtype=object)[order],
+                      np.asarray(sids), indptr, indices, names, np.asarray(rows)[popularity], popularity)
+
+def ingestDF(df):
+    """Encode a filtered enrollment DataFrame (see readEnrollment) in one pass,
+    no per-course scans"""
+
+    # Codes follow first appearance, the same order groupby(sort=False) uses
+    courseCodes, courseNames = pd.factorize(df['CourseSection'])
+    sidCodes, sids = pd.factorize(df['SID'])
+    timeCodes, timeLabels = pd.factorize(df['Time Slot'])
+    rows = np.bincount(courseCodes, minlength=len(courseNames))
+    return encodeEnrollment(courseNames, rows, courseCodes, sidCodes, sids,
+                            (courseCodes, timeCodes), np.asarray(timeLabels, dtype=object))
+
+def streamEnrollment(path, chunksize=CHUNK_ROWS, instrumentation=None):
+    """Encode an enrollment CSV chunk by chunk. Strings are interned into integer
+    codes as they are read and only the (course, student) and (course, time) pairs
+    are kept, so memory grows with the enrollment, not with the file's text.
+    Gives the same Enrollment as ingestDF(readEnrollment(path))"""
+    stats = instrumentation or Instrumentation()
+    # KEY: Section, SID or time label
+    # VALUE: Its code, in order of first appearance
+    courseTable, sidTable, timeTable = {}, {}, {}
+    rows = np.zeros(0, dtype=np.intp)
+    pairs, timePairs = [], []
+
+    with stats.stage('read'):
+        chunks = pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, index_col=False, chunksize=chunksize)
+        for chunk in chunks:
+            chunk, _, _ = dropSections(chunk)
+            codes, uniques = pd.factorize(chunk['CourseSection'])
+            courses = intern(courseTable, np.asarray(uniques))[codes]
+            codes, uniques = pd.factorize(chunk['SID'])
+            students = intern(sidTable, np.asarray(uniques))[codes]
+            codes, uniques = pd.factorize(chunk['Time Slot'])
+            times = intern(timeTable, np.asarray(uniques))[codes]
+
+            counts = np.bincount(courses, minlength=len(courseTable))
+            counts[:len(rows)] += rows
+            rows = counts
+            # Dropping repeats per chunk keeps the kept pairs close to the enrollment size
+            pairs.append(np.unique(courses.astype(np.int64) << 32 | students))
+            timePairs.append(np.unique(courses.astype(np.int64) << 32 | times))
+            stats.count('chunks')
+
+    with stats.stage('groups'):
+        pairs = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+        timePairs = np.unique(np.concatenate(timePairs)) if timePairs else np.empty(0, dtype=np.int64)
+        mask = (1 << 32) - 1
+        return encodeEnrollment(list(courseTable), rows, (pairs >> 32).astype(np.intp), (pairs & mask).astype(np.intp),
+                                np.array(list(sidTable), dtype=object),
+                                ((timePairs >> 32).astype(np.intp), (timePairs & mask).astype(np.intp)),
+                                np.array(list(timeTable), dtype=object))
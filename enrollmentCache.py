@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from enrollment import (COLUMNS, COURSE_PATTERN, SECTION_FILTERS, Enrollment, ingestDF, isParquet,
+                        readEnrollment, streamEnrollment)
+from conflictGraph import ConflictGraph
+from instrumentation import Instrumentation
+
+# Override the cache location, e.g. for a shared batch box
+CACHE_ENV = 'FINALS_CACHE_DIR'
+# Total size kept on disk before the least recently used entries are evicted
+CACHE_LIMIT = 512 * 2**20
+# Bump when the stored arrays or the CSV filters change so old entries are ignored
+CACHE_VERSION = 1
+
+# Arrays stored per entry, one .npy file each so they can be memory-mapped
+ARRAYS = ['courses', 'names', 'times', 'timeSlots', 'sids', 'indptr', 'indices', 'rows', 'firstSeen']
+
+def cacheDir():
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'finals-scheduler')
+
+def cacheKey(path):
+    """Hash of the file contents plus everything that changes how it is parsed"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_VERSION, COLUMNS, SECTION_FILTERS, COURSE_PATTERN]).encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def storeEnrollment(entry, enrollment):
+    """Write the arrays of an enrollment and its conflict graph into entry"""
+    # Written to a temporary folder first so a crash never leaves half an entry
+    parent = os.path.dirname(entry)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        for name in ARRAYS:
+            array = getattr(enrollment, name)
+            if array.dtype == object:
+                # Text columns are stored as fixed-width unicode, no pickling
+                array = array.astype(str)
+            np.save(os.path.join(tmp, name + '.npy'), array, allow_pickle=False)
+        graph = enrollment.conflictGraph()
+        np.save(os.path.join(tmp, 'edges.npy'), graph.edges)
+        np.save(os.path.join(tmp, 'weights.npy'), graph.weights)
+        os.replace(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+
+def loadStored(entry):
+    """Memory-map a stored enrollment, nothing is read until it is used"""
+    arrays = {name: np.load(os.path.join(entry, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+    enrollment = Enrollment(**arrays)
+    enrollment.graph = ConflictGraph(enrollment,
+                                     np.load(os.path.join(entry, 'edges.npy'), mmap_mode='r'),
+                                     np.load(os.path.join(entry, 'weights.npy'), mmap_mode='r'))
+    return enrollment
+
+def entrySize(entry):
+    return sum(entry.stat().st_size for entry in os.scandir(entry))
+
+def evict(directory, limit=CACHE_LIMIT):
+    """Remove least recently used entries until the cache fits in limit bytes"""
+    entries = [entry for entry in os.scandir(directory) if entry.is_dir()]
+    # Loading an entry touches it, so mtime is the last time it was used
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    sizes = {entry.path: entrySize(entry.path) for entry in entries}
+    total = sum(sizes.values())
+    for entry in entries:
+        if total <= limit:
+            break
+        shutil.rmtree(entry.path, ignore_errors=True)
+        total -= sizes[entry.path]
+
+def parseEnrollment(path, stats):
+    if isParquet(path):
+        df = readEnrollment(path, stats)
+        with stats.stage('groups'):
+            return ingestDF(df)
+    # CSVs are streamed so large extracts never sit in memory as text
+    return streamEnrollment(path, instrumentation=stats)
+
+def loadEnrollment(path, cache=True, instrumentation=None, directory=None):
+    """Parsed, integer-encoded enrollment of every filtered section in path.
+    Unchanged files are loaded from the on-disk cache instead of being parsed"""
+    stats = instrumentation or Instrumentation()
+    if not cache:
+        return parseEnrollment(path, stats)
+
+    directory = directory or cacheDir()
+    with stats.stage('hash'):
+        entry = os.path.join(directory, cacheKey(path))
+
+    if os.path.isdir(entry):
+        try:
+            with stats.stage('cacheLoad'):
+                enrollment = loadStored(entry)
+            os.utime(entry)
+            stats.count('cacheHits')
+            return enrollment
+        except (OSError, ValueError):
+            # Damaged entry, parse the file again and replace it
+            shutil.rmtree(entry, ignore_errors=True)
+
+    stats.count('cacheMisses')
+    enrollment = parseEnrollment(path, stats)
+    with stats.stage('cacheStore'):
+        try:
+            storeEnrollment(entry, enrollment)
+            evict(directory)
+        except OSError:
+            # A read-only or full disk only loses the speedup
+            pass
+    return enrollment
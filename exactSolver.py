@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from conflictEngine import MAX_DAILY_EXAMS
+
+# Seconds the exact solver may run, it returns the best schedule found so far
+DEFAULT_LIMIT = 120
+# Seconds between progress checks while the solver searches, so a cancel stops it
+POLL_SECONDS = 0.5
+
+def studentCourseSets(enrollment):
+    """Distinct sets of course ids taken together by one student, only sets
+    larger than the daily exam limit can constrain anything"""
+    sizes = np.diff(enrollment.indptr)
+    courseIds = np.repeat(np.arange(len(enrollment)), sizes)
+    order = np.argsort(np.asarray(enrollment.indices), kind='stable')
+    students = np.asarray(enrollment.indices)[order]
+    courseIds = courseIds[order]
+    bounds = np.flatnonzero(np.diff(students)) + 1
+    return {tuple(sorted(set(group.tolist()))) for group in np.split(courseIds, bounds)
+            if len(group) > MAX_DAILY_EXAMS}
+
+def solveExact(engine, timeLimit=DEFAULT_LIMIT, workers=None, progress=None, log=print):
+    """Minimize exam days, then slots, with OR-Tools CP-SAT.
+    The engine must already hold a feasible schedule (e.g. from the greedy); it is
+    used as the search hint and its length bounds the slots in the model. On return
+    the engine holds the best schedule found. timeLimit includes building the model.
+    progress(seconds, timeLimit) is called on every improvement and every
+    POLL_SECONDS, and may raise to stop. Returns a dict with the status, objective,
+    lower bound and gap in days"""
+    try:
+        from ortools.sat.python import cp_model
+    except ImportError:
+        raise ImportError('The exact solver needs OR-Tools, install it with `pip install ortools`') from None
+
+    begin = time.perf_counter()
+    enrollment, maxTests = engine.enrollment, engine.maxTests
+    courses = [engine.enrollment.courses[c] for c in range(len(enrollment))]
+    graph = enrollment.conflictGraph()
+    numSlots = len(engine.schedule)
+    numDays = -(-numSlots // maxTests)
+    classTimes = [record.time for record in engine.records]
+    times = sorted(set(classTimes))
+    timeIds = {time: t for t, time in enumerate(times)}
+
+    model = cp_model.CpModel()
+    # x[c][s]: course c takes its final in slot s
+    x = [[model.NewBoolVar(f'x{c}_{s}') for s in range(numSlots)] for c in range(len(courses))]
+    # inDay[c][d]: course c takes its final on day d
+    inDay = [[model.NewBoolVar(f'd{c}_{d}') for d in range(numDays)] for c in range(len(courses))]
+    usedSlot = [model.NewBoolVar(f'slot{s}') for s in range(numSlots)]
+    usedDay = [model.NewBoolVar(f'day{d}') for d in range(numDays)]
+    # Days the schedule spans, up to and including the last day used
+    span = model.NewIntVar(0, numDays, 'span')
+    # hasTime[s][t]: a course meeting at class time t is in slot s
+    hasTime = [[model.NewBoolVar(f't{s}_{t}') for t in range(len(times))] for s in range(numSlots)]
+    # mixed[s]: slot s holds courses with different class times, so no student may repeat in it
+    mixed = [model.NewBoolVar(f'mixed{s}') for s in range(numSlots)]
+
+    for c in range(len(courses)):
+        model.AddExactlyOne(x[c])
+        t = timeIds[classTimes[c]]
+        for s in range(numSlots):
+            model.AddImplication(x[c][s], usedSlot[s])
+            model.AddImplication(x[c][s], hasTime[s][t])
+        for d in range(numDays):
+            model.Add(inDay[c][d] == sum(x[c][d * maxTests:(d + 1) * maxTests]))
+
+    for s in range(numSlots):
+        model.AddImplication(usedSlot[s], usedDay[s // maxTests])
+    for d in range(numDays):
+        model.Add(span >= (d + 1) * usedDay[d])
+        model.Add(sum(hasTime[s]) <= 1 + len(times) * mixed[s])
+
+    # Same rule as checkCourseTiming: courses sharing students may share a slot
+    # only if every course in it meets at the same class time
+    for a, b in graph.edges:
+        sameTime = classTimes[a] == classTimes[b]
+        for s in range(numSlots):
+            if sameTime:
+                model.Add(x[a][s] + x[b][s] + mixed[s] <= 2)
+            else:
+                model.AddBoolOr([x[a][s].Not(), x[b][s].Not()])
+
+    # No slot holds more students than the rooms seat, or more sections than there
+    # are rooms. Online finals need no seats
+    if engine.capacity is not None:
+        for s in range(numSlots):
+            model.Add(sum(record.seats * x[c][s] for c, record in enumerate(engine.records)) <= engine.capacity)
+            model.Add(sum(len(record.sections) * x[c][s] for c, record in enumerate(engine.records))
+                      <= len(engine.rooms))
+
+    # Slots ruled out for a course, and one exam per instructor per slot
+    if engine.constraints is not None:
+        # KEY: Instructor ID
+        # VALUE: Its course ids
+        taught = {}
+        for c, record in enumerate(engine.records):
+            for s in range(numSlots):
+                if record.forbidden >> s & 1:
+                    model.Add(x[c][s] == 0)
+            for instructor in record.instructors:
+                taught.setdefault(instructor, []).append(c)
+        for group in taught.values():
+            if len(group) > 1:
+                for s in range(numSlots):
+                    model.AddAtMostOne(x[c][s] for c in group)
+
+    # At most MAX_DAILY_EXAMS per student per day, once per distinct course set
+    for group in studentCourseSets(enrollment):
+        for d in range(numDays):
+            model.Add(sum(inDay[c][d] for c in group) <= MAX_DAILY_EXAMS)
+
+    # Days are interchangeable, and so are slots within a day, use them in order.
+    # Not once some slots are ruled out for some courses
+    interchangeable = engine.constraints is None or not any(record.forbidden for record in engine.records)
+    if interchangeable:
+        for d in range(numDays - 1):
+            model.AddImplication(usedDay[d + 1], usedDay[d])
+        for s in range(numSlots - 1):
+            if (s + 1) % maxTests:
+                model.AddImplication(usedSlot[s + 1], usedSlot[s])
+    # Shortest span of days first, then fewest slots. Without the symmetry breaking
+    # early days may be left empty, so the span is what counts, not the days used
+    model.Minimize((numSlots + 1) * span + sum(usedSlot))
+
+    # Warm start from the schedule already in the engine
+    for c, course in enumerate(courses):
+        for s in range(numSlots):
+            model.AddHint(x[c][s], int(engine.slots[c]) == s)
+    for s in range(numSlots):
+        model.AddHint(usedSlot[s], bool(engine.schedule[s]))
+
+    def days(objective):
+        return int(objective // (numSlots + 1))
+
+    class Reporter(cp_model.CpSolverSolutionCallback):
+        """Keeps (and logs) the best schedule and lower bound in days whenever either changes"""
+
+        def __init__(self):
+            super().__init__()
+            self.best = numDays
+            self.lower = 0
+            self.error = None
+            # (seconds, best days, lower bound in days) of every change
+            self.history = []
+
+        def report(self, best, lower):
+            if (best, lower) == (self.best, self.lower):
+                return
+            self.best, self.lower = best, lower
+            self.history.append((round(time.perf_counter() - start, 2), best, lower))
+            if log:
+                log(f'Exact solver {time.perf_counter() - start:.1f} s: {best} days, lower bound {lower} days, '
+                    f'gap {(best - lower) / best:.0%}')
+
+        def on_solution_callback(self):
+            self.report(days(self.ObjectiveValue()), days(self.BestObjectiveBound()))
+            check()
+
+    def check():
+        """Call progress, a raised error stops the search and is raised once it returns"""
+        if progress and reporter.error is None:
+            try:
+                progress(int(time.perf_counter() - begin), int(timeLimit))
+            except Exception as e:
+                reporter.error = e
+                solver.StopSearch()
+
+    def poll():
+        # Also between solutions, a slow or infeasible search may find none for long
+        while not finished.wait(POLL_SECONDS):
+            check()
+
+    solver = cp_model.CpSolver()
+    # What is left of the budget after building the model
+    solver.parameters.max_time_in_seconds = max(timeLimit - (time.perf_counter() - begin), 0)
+    solver.parameters.num_workers = workers or min(os.cpu_count() or 1, 8)
+    reporter = Reporter()
+    solver.best_bound_callback = lambda bound: reporter.report(reporter.best, max(reporter.lower, days(bound)))
+    finished = threading.Event()
+    poller = threading.Thread(target=poll, daemon=True)
+    start = time.perf_counter()
+    poller.start()
+    try:
+        status = solver.Solve(model, reporter)
+    finally:
+        finished.set()
+        poller.join()
+    if reporter.error is not None:
+        raise reporter.error
+
+    result = {'status': solver.StatusName(status), 'seconds': round(solver.WallTime(), 2),
+              'history': reporter.history}
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return result
+
+    # Days are already in order, empty slots inside a day are moved to its end
+    # if slots are interchangeable
+    slots = {}
+    for c, course in enumerate(courses):
+        s = next(s for s in range(numSlots) if solver.BooleanValue(x[c][s]))
+        slots.setdefault(s, []).append(course)
+    # Removed one by one so the engine's placement counters are kept
+    for course in courses:
+        engine.remove(course)
+    engine.trim()
+    for d in range(numDays):
+        used = [s for s in range(d * maxTests, (d + 1) * maxTests) if s in slots]
+        for i, s in enumerate(used):
+            for course in slots[s]:
+                engine.place(course, d * maxTests + i if interchangeable else s)
+    engine.trim()
+
+    # Days of the schedule the engine now holds, the one exported
+    best, lower = engine.numDays, days(solver.BestObjectiveBound())
+    result.update(days=best, lowerBound=lower, gap=round((best - lower) / best, 4))
+    return result
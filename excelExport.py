@@ -1,7 +1,10 @@
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import *
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
 
-def exportExcel(schedule, ntimes, path, compact=False, maxRows=15):
+def exportExcel(schedule, ntimes, path, compact=False, maxRows=15, analytics=None, rooms=None):
     wb = Workbook()
     sheet = wb.active
 
@@ -51,7 +54,7 @@ def exportExcel(schedule, ntimes, path, compact=False, maxRows=15):
         sheet.cell(row=tRow+n, column=cols+2).number_format = numbers.FORMAT_TEXT
     
     # Helper variables for formatting and references
-    dataCol = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[cols+1] #stupidest implementation possible but it works lmao
+    dataCol = get_column_letter(cols+2)
     courseBorder = Border(bottom=thin, left=thin, right=thin, top=thin)
     roomBorder = Border(bottom=thin, top=thin, left=thin, right=thick)
     darkColor = PatternFill("solid",fgColor="FFa5c9ef")
@@ -87,6 +90,9 @@ def exportExcel(schedule, ntimes, path, compact=False, maxRows=15):
                 sheet.cell(row=curRow,column=curCol).value = course
                 sheet.cell(row=curRow,column=curCol).alignment = Alignment(horizontal='center', vertical='center')
                 sheet.cell(row=curRow,column=curCol).border = courseBorder
+                # Room column from the room allocation, if there was one
+                if rooms is not None:
+                    sheet.cell(row=curRow,column=curCol+1).value = rooms.get(course)
                 sheet.cell(row=curRow,column=curCol+1).alignment = Alignment(horizontal='center', vertical='center')
                 sheet.cell(row=curRow,column=curCol+1).border = roomBorder
                 if n%2==0:
@@ -124,4 +130,205 @@ def exportExcel(schedule, ntimes, path, compact=False, maxRows=15):
                 sheet.merge_cells(f"A{startRow}:A{maxRow}")
                 curRow = maxRow + 1
 
+    if analytics is not None:
+        analyticsSheet(wb, analytics, ntimes)
     wb.save(filename=path)
+
+def analyticsRows(analytics, ntimes):
+    """Rows of the analytics sheet for a scheduleAnalytics result"""
+    yield ['Students with exams', analytics['students']]
+    yield ['Students with back-to-back exams', analytics['backToBack']]
+    yield ['Students with 2+ exams in a day', analytics['doubleDays']]
+    yield ['Days used', analytics['days']]
+    if analytics['maxDays'] is not None:
+        yield ['Max days', analytics['maxDays']]
+        yield ['Max days exceeded', 'Yes' if analytics['exceeded'] else 'No']
+    yield []
+
+    yield ['Exam Time', 'Students']
+    for n, count in enumerate(analytics['slotHeadcounts']):
+        yield [f'Day {n//ntimes+1} Slot {n%ntimes+1}', count]
+    yield []
+
+    # One column per number of exams in the day
+    width = max((len(day) for day in analytics['dayHistograms']), default=1)
+    yield ['Exams in day'] + [f'{k} exams' for k in range(width)]
+    for d, day in enumerate(analytics['dayHistograms']):
+        yield [f'Day {d+1}'] + day
+    if analytics['overflow']:
+        yield []
+        yield [f'Courses past day {analytics["maxDays"]}']
+        for course in analytics['overflow']:
+            yield [course]
+
+def analyticsSheet(wb, analytics, ntimes):
+    """Add the schedule analytics as a sheet of its own, works on write-only workbooks too"""
+    sheet = wb.create_sheet('Analytics')
+    sheet.column_dimensions['A'].width = 34
+    for row in analyticsRows(analytics, ntimes):
+        sheet.append(row)
+
+
+class SheetStyles:
+    """Named styles shared by every cell of the streaming export, built once per
+    combination of role, fill and border instead of once per cell"""
+
+    def __init__(self, wb):
+        self.wb = wb
+        self.names = set()
+
+        thin = Side(border_style="thin")
+        thick = Side(border_style="thick")
+        self.thin = thin
+        self.thick = thick
+        self.fills = {'dark': PatternFill("solid", fgColor="FFa5c9ef"),
+                      'light': PatternFill("solid", fgColor="FFd2e4f7")}
+
+        # Style for colunmn labels
+        header = NamedStyle(name='header')
+        header.font = Font(bold=True, size=14)
+        header.alignment = Alignment(horizontal='center', vertical='center')
+        header.border = Border(bottom=thick)
+        self.add(header)
+
+        # Labels of the date and time reference table
+        referenceHeader = NamedStyle(name='referenceHeader')
+        referenceHeader.font = Font(bold=True)
+        referenceHeader.alignment = Alignment(horizontal='center', vertical='center')
+        referenceHeader.border = Border(bottom=thick)
+        self.add(referenceHeader)
+
+        reference = NamedStyle(name='reference')
+        reference.font = DEFAULT_FONT
+        reference.number_format = numbers.FORMAT_TEXT
+        self.add(reference)
+
+    def add(self, style):
+        self.wb.add_named_style(style)
+        self.names.add(style.name)
+
+    def get(self, role, fill=None, top=False, bottom=False):
+        """Name of the style for a schedule cell, registering it on first use.
+        role is 'label' (exam time), 'edge' (bottom of merged label), 'course' or 'room'"""
+        name = f'{role} {fill} {int(top)}{int(bottom)}'
+        if name in self.names:
+            return name
+
+        style = NamedStyle(name=name)
+        style.font = DEFAULT_FONT
+        thin, thick = self.thin, self.thick
+        if role == 'label':
+            style.alignment = Alignment(horizontal='center', vertical='center', wrapText=True)
+        elif role in ('course', 'room'):
+            style.alignment = Alignment(horizontal='center', vertical='center')
+        if fill is not None:
+            style.fill = self.fills[fill]
+
+        if role in ('course', 'room'):
+            style.border = Border(bottom=thick if bottom else thin, top=thick if top else thin,
+                                  left=thin, right=thick if role == 'room' else thin)
+        elif bottom:
+            style.border = Border(bottom=thick, left=thin, right=thin, top=thin)
+        self.add(style)
+        return name
+
+def countColumns(schedule, compact, maxRows):
+    cols = 3
+    if compact: # Only change # cols in compact mode
+        for slot in schedule:
+            need = (len(slot)//maxRows)*2+3
+            if need > cols:
+                cols = need
+    return cols
+
+def slotBlock(courses, n, height, formula, styles, rooms=None):
+    """Rows of (value, style) cells for one exam slot, matching exportExcel's layout"""
+    fill = 'dark' if n%2==0 else 'light'
+    pairs = -(-len(courses)//height)
+    block = [[None]*(1+2*pairs) for _ in range(height)]
+
+    for k, course in enumerate(courses):
+        p, r = divmod(k, height)
+        # Wrapped columns start with a thick top border
+        top = p > 0 and r == 0
+        bottom = False
+        if r == height-1 and p < pairs-1:
+            # Thick border beneath every full column, replacing the top border
+            top, bottom = False, True
+        elif k == len(courses)-1:
+            bottom = True
+            top = pairs > 1 and r == 0
+        block[r][1+2*p] = (course, styles.get('course', fill, top, bottom))
+        block[r][2+2*p] = (rooms.get(course) if rooms is not None else None, styles.get('room', fill, top, bottom))
+
+    # Exam time label, merged down the whole block
+    block[0][0] = (formula, styles.get('label', fill, bottom=height == 1))
+    if height > 1:
+        block[height-1][0] = (None, styles.get('edge', bottom=True))
+    return block
+
+def exportExcelStreaming(schedule, ntimes, path, compact=False, maxRows=15, analytics=None, rooms=None):
+    """Same layout as exportExcel, but rows are streamed through a write-only
+    workbook so memory use doesn't grow with the size of the schedule.
+    rooms maps course names to the text of their Room cell"""
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet()
+    styles = SheetStyles(wb)
+
+    cols = countColumns(schedule, compact, maxRows)
+    dataCol = get_column_letter(cols+2)
+    for c in range(1, cols+3):
+        sheet.column_dimensions[get_column_letter(c)].width = 20
+
+    # Date and time inputs to be referenced in-sheet later, keyed by row
+    reference = {}
+    for n in range(1, len(schedule)//ntimes+2):
+        reference[n+1] = (f"Day {n}", 'reference')
+    tRow = len(schedule)//ntimes+4
+    reference[tRow] = ('Times', 'referenceHeader')
+    for n in range(1, ntimes+1):
+        reference[tRow+n] = (f"Slot {n}", 'reference')
+
+    def writeRow(values, row):
+        cells = [None]*(cols+2)
+        for c, value in enumerate(values):
+            if value is not None:
+                cells[c] = value
+        if row in reference:
+            cells[cols+1] = reference[row]
+        out = []
+        for value in cells:
+            if value is None:
+                out.append(None)
+                continue
+            cell = WriteOnlyCell(sheet, value=value[0])
+            cell.style = value[1]
+            out.append(cell)
+        sheet.append(out)
+
+    # Labels
+    header = [('Exam Time', 'header')]
+    for c in range(2, cols+2): # Loop for compact columns
+        header.append(('Course' if c%2 == 0 else 'Room', 'header') if c <= cols else (None, 'header'))
+    header.append(('Dates', 'referenceHeader'))
+    writeRow(header, 1)
+
+    curRow = 2
+    for n in range(len(schedule)):
+        if len(schedule[n]) != 0:
+            courses = sorted(schedule[n])
+            height = maxRows if compact and len(courses) > maxRows else len(courses)
+            formula = f'=_xlfn.TEXTJOIN(CHAR(10), TRUE, {dataCol}{n//ntimes+2}, {dataCol}{n%ntimes+tRow+1})'
+            for values in slotBlock(courses, n, height, formula, styles, rooms):
+                writeRow(values, curRow)
+                curRow += 1
+            if height > 1:
+                sheet.merged_cells.add(f"A{curRow-height}:A{curRow-1}")
+
+    # Rest of the reference table if it runs past the schedule
+    for row in range(curRow, max(reference)+1):
+        writeRow([], row)
+
+    if analytics is not None:
+        analyticsSheet(wb, analytics, ntimes)
+    wb.save(path)
@@ -0,0 +1,191 @@
+"""Schedule writers, picked by format or by the extension of the output path.
+
+    exportSchedule('fall.csv', schedule, maxTests, enrollment, stats.results)
+    exportSchedule('calendars', schedule, maxTests, enrollment, format='ics', startDate=date(2026, 12, 7))
+
+Every writer takes the output path and a ScheduleExport. A new format is a
+function of that shape added with registerExporter.
+"""
+
+import csv
+import json
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+
+# Minutes an exam lasts and between the starts of two slots by default
+DEFAULT_DURATION = 120
+SLOT_SPACING = 150
+FIRST_START = time(9, 0)
+
+class ScheduleExport:
+    """Everything a writer may need, with the per-slot and per-student views
+    computed once for all of them"""
+
+    def __init__(self, schedule, maxTests, enrollment=None, results=None, startDate=None, slotTimes=None,
+                 duration=DEFAULT_DURATION):
+        self.schedule = schedule
+        self.maxTests = maxTests
+        # Needed for headcounts and per-student output, any enrollment holding the scheduled courses
+        self.enrollment = enrollment
+        results = results or {}
+        # KEY: Course name
+        # VALUE: Its room(s), from the room allocation
+        self.rooms = results.get('rooms') or {}
+        self.analytics = results.get('analytics')
+        # Exams are on weekdays from startDate on, slot i of a day starts at slotTimes[i].
+        # Both may be given as ISO text ('2026-12-07', '09:00,11:30,14:00')
+        if isinstance(startDate, str):
+            startDate = date.fromisoformat(startDate)
+        if isinstance(slotTimes, str):
+            slotTimes = slotTimes.split(',')
+        self.startDate = startDate or date.today()
+        self.slotTimes = [time.fromisoformat(t.strip()) if isinstance(t, str) else t for t in slotTimes or ()]
+        if not self.slotTimes:
+            self.slotTimes = [(datetime.combine(date.min, FIRST_START)
+                               + timedelta(minutes=SLOT_SPACING * i)).time() for i in range(maxTests)]
+        if len(self.slotTimes) < maxTests:
+            raise ValueError(f'{len(self.slotTimes)} slot times given for {maxTests} slots per day')
+        self.duration = timedelta(minutes=duration)
+
+        # KEY: Course name
+        # VALUE: Course ID in the enrollment
+        self.ids = {} if enrollment is None else {course: c for c, course in enumerate(enrollment.courses)}
+
+    def entries(self):
+        """(slot, course) of every exam, in slot order and sorted by course within a slot"""
+        for i, slot in enumerate(self.schedule):
+            for course in sorted(slot):
+                yield i, course
+
+    def headcount(self, course):
+        if course not in self.ids:
+            return None
+        c = self.ids[course]
+        return int(self.enrollment.indptr[c + 1] - self.enrollment.indptr[c])
+
+    def start(self, i):
+        """Start of slot i, days skip weekends"""
+        day = np.busday_offset(np.datetime64(self.startDate, 'D'), i // self.maxTests, roll='forward')
+        return datetime.combine(day.astype(date), self.slotTimes[i % self.maxTests])
+
+    def studentExams(self):
+        """(SID, [(slot, course), ...]) of every student with an exam, ordered by
+        dense student id, from one sort of the course -> student index"""
+        if self.enrollment is None:
+            raise ValueError('Per-student output needs the enrollment')
+        enrollment = self.enrollment
+        slots = np.full(len(enrollment), -1, dtype=np.int64)
+        for i, slot in enumerate(self.schedule):
+            for course in slot:
+                slots[self.ids[course]] = i
+        courseIds = np.repeat(np.arange(len(enrollment)), np.diff(enrollment.indptr))
+        students = np.asarray(enrollment.indices)
+        placed = slots[courseIds] >= 0
+        courseIds, students = courseIds[placed], students[placed]
+        # Student first, then slot
+        order = np.lexsort((slots[courseIds], students))
+        courseIds, students = courseIds[order], students[order]
+        bounds = np.flatnonzero(np.diff(students)) + 1
+        courses = enrollment.courses
+        for group, student in zip(np.split(courseIds, bounds), students[np.r_[0, bounds]] if len(students) else []):
+            yield enrollment.sids[student], [(int(slots[c]), str(courses[c])) for c in group]
+
+def writeExcel(path, export):
+    from excelExport import exportExcelStreaming
+    exportExcelStreaming(export.schedule, export.maxTests, path, False, 10, export.analytics, export.rooms or None)
+
+def writeCSV(path, export):
+    """One row per exam"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Day', 'Slot', 'Start', 'Course', 'Room', 'Students'])
+        for i, course in export.entries():
+            writer.writerow([i // export.maxTests + 1, i % export.maxTests + 1, export.start(i).isoformat(' '),
+                             course, export.rooms.get(course, ''), export.headcount(course)])
+
+def writeJSON(path, export):
+    """The schedule as one JSON object, written a slot at a time"""
+    with open(path, 'w') as f:
+        f.write(f'{{"maxTests": {export.maxTests}, "slots": [')
+        for i, slot in enumerate(export.schedule):
+            exams = [{'course': course, 'room': export.rooms.get(course), 'students': export.headcount(course)}
+                     for course in sorted(slot)]
+            f.write((',' if i else '') + '\n  ' + json.dumps({'day': i // export.maxTests + 1,
+                                                             'slot': i % export.maxTests + 1,
+                                                             'start': export.start(i).isoformat(),
+                                                             'exams': exams}))
+        f.write('\n]')
+        if export.analytics is not None:
+            f.write(', "analytics": ' + json.dumps(export.analytics))
+        f.write('}\n')
+
+def writeStudentLines(path, export):
+    """One JSON line per student with their exams in time order"""
+    # Start and room of every slot and course are formatted once, not per student
+    starts = [export.start(i).isoformat() for i in range(len(export.schedule))]
+    with open(path, 'w') as f:
+        for sid, exams in export.studentExams():
+            f.write(json.dumps({'sid': str(sid), 'exams': [{'course': course, 'start': starts[i],
+                                                            'room': export.rooms.get(course)}
+                                                           for i, course in exams]}) + '\n')
+
+def icsText(text):
+    """Escape text for an iCalendar property value"""
+    return re.sub(r'([\\;,])', r'\\\1', str(text)).replace('\n', '\\n')
+
+def writeCalendars(path, export):
+    """A directory with one .ics calendar per student, named after the SID"""
+    os.makedirs(path, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    # VEVENT of every course, shared by all its students
+    events = {}
+    for i, course in export.entries():
+        start = export.start(i)
+        lines = ['BEGIN:VEVENT',
+                 f"UID:{re.sub(r'[^A-Za-z0-9-]', '', course)}-{start:%Y%m%dT%H%M}@finals-scheduler",
+                 f'DTSTAMP:{stamp}',
+                 f'DTSTART:{start:%Y%m%dT%H%M%S}',
+                 f'DTEND:{start + export.duration:%Y%m%dT%H%M%S}',
+                 f'SUMMARY:{icsText("Final exam: " + course)}']
+        if course in export.rooms:
+            lines.append(f'LOCATION:{icsText(export.rooms[course])}')
+        lines.append('END:VEVENT')
+        events[course] = '\r\n'.join(lines)
+    header = 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Simmons University//Finals Scheduler//EN\r\n'
+    for sid, exams in export.studentExams():
+        name = re.sub(r'[^\w.-]', '_', str(sid))
+        with open(os.path.join(path, f'{name}.ics'), 'w', newline='') as f:
+            f.write(header + '\r\n'.join(events[course] for _, course in exams) + '\r\nEND:VCALENDAR\r\n')
+
+# KEY: Format
+# VALUE: (Writer, description, True if it needs the enrollment)
+EXPORTERS = {'xlsx': (writeExcel, 'Styled Excel workbook', False),
+             'csv': (writeCSV, 'CSV, one row per exam', False),
+             'json': (writeJSON, 'JSON schedule with the analytics', False),
+             'jsonl': (writeStudentLines, 'JSON lines, one student per line', True),
+             'ics': (writeCalendars, 'Directory of one iCalendar file per student', True)}
+
+def registerExporter(format, writer, description, students=False):
+    """Add a format, writer(path, export) receives a ScheduleExport"""
+    EXPORTERS[format] = (writer, description, students)
+
+def formatOf(path, format=None):
+    """format, or the format matching the extension of path, xlsx for any other extension"""
+    if format is None:
+        format = os.path.splitext(str(path))[1].lstrip('.').lower()
+        return format if format in EXPORTERS else 'xlsx'
+    if format not in EXPORTERS:
+        raise ValueError(f"Unknown export format '{format}', choose from {', '.join(EXPORTERS)}")
+    return format
+
+def exportSchedule(path, schedule, maxTests, enrollment=None, results=None, format=None, **options):
+    """Write schedule to path with the writer of format (by default from the extension).
+    results are the instrumentation results holding the rooms and analytics,
+    options go to ScheduleExport (startDate, slotTimes, duration)"""
+    writer, _, students = EXPORTERS[formatOf(path, format)]
+    if students and enrollment is None:
+        raise ValueError(f'{formatOf(path, format)} output needs the enrollment')
+    writer(path, ScheduleExport(schedule, maxTests, enrollment, results, **options))
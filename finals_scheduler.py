@@ -0,0 +1,282 @@
+"""Headless entry point for the finals scheduler.
+
+    python -m finals_scheduler schedule enrollment.csv --max-tests 4 --max-days 4 -o out.xlsx
+    python -m finals_scheduler schedule terms/ -o schedules/ --workers 4
+    python -m finals_scheduler jobs submit fall.csv -o fall.xlsx --time-limit 300
+    python -m finals_scheduler jobs run --workers 4
+
+Only pandas, numpy and the scheduler are imported; Qt is never loaded and
+openpyxl only when an output spreadsheet is requested.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from strategies import availableStrategies
+
+FINALS_DEFAULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'res', 'courseFinals.json')
+
+def loadFinals(path):
+    with open(path) as f:
+        return json.load(f)
+
+def runSchedule(path, finals, maxTests, strategy, output, verbose, profile='', cache=True,
+                maxDays=None, timeBudget=None, improveTime=None, merge=False, rooms=None, constraints=None,
+                format=None, startDate=None, slotTimes=None):
+    """Schedule one enrollment file, returns the instrumentation report"""
+    # Imported here so `--help` and argument errors stay instant
+    from enrollment import defaultFinals
+    from enrollmentCache import loadEnrollment
+    from instrumentation import Instrumentation
+    from old_code import buildSchedule, printSchedule
+
+    stats = Instrumentation(profile)
+    with stats.capture():
+        enrollment = loadEnrollment(path, cache, stats)
+        courses = defaultFinals(enrollment, finals)
+        schedule = buildSchedule(enrollment, courses, maxTests, strategy, instrumentation=stats,
+                                 maxDays=maxDays, timeBudget=timeBudget, improveTime=improveTime, merge=merge,
+                                 rooms=rooms, constraints=constraints)
+        if output:
+            with stats.stage('export'):
+                from exporters import exportSchedule
+                exportSchedule(output, schedule, maxTests, enrollment, stats.results, format,
+                               startDate=startDate, slotTimes=slotTimes)
+    if verbose:
+        printSchedule(schedule, maxTests)
+    stats.results.update(input=str(path), output=output)
+    return stats.report()
+
+def report(result, maxDays, detailed):
+    path, output, slots, days = (result['results'][key] for key in ('input', 'output', 'slots', 'days'))
+    print(f'{path}: {slots} slots over {days} days' + (f' -> {output}' if output else ''))
+    if days > maxDays:
+        print(f'Warning: {path} needs {days} days, more than the maximum of {maxDays}', file=sys.stderr)
+        overflow = result['results']['analytics']['overflow']
+        print(f'  {len(overflow)} courses past day {maxDays}: ' + ', '.join(overflow[:10])
+              + (', ...' if len(overflow) > 10 else ''), file=sys.stderr)
+    if result['results'].get('unassigned'):
+        unassigned = result['results']['unassigned']
+        print(f'Warning: {len(unassigned)} courses without enough room seats: ' + ', '.join(unassigned[:10])
+              + (', ...' if len(unassigned) > 10 else ''), file=sys.stderr)
+    analytics = result['results']['analytics']
+    print(f"  {analytics['backToBack']:,} students with back-to-back exams, "
+          f"{analytics['doubleDays']:,} with 2+ exams in a day")
+    exact = result['results'].get('exact')
+    if exact:
+        print(f"  exact solver {exact['status'].lower()} after {exact['seconds']} s"
+              + (f": {exact['days']} days, lower bound {exact['lowerBound']} days, gap {exact['gap']:.0%}"
+                 if 'days' in exact else ''))
+    if detailed:
+        print('  ' + ', '.join(f'{name} {seconds:.3f} s' for name, seconds in result['stages'].items()))
+        print('  ' + ', '.join(f'{name} {value:,}' for name, value in sorted(result['counters'].items())))
+        if 'memory' in result:
+            print(f"  peak traced memory {result['memory']['peakMB']} MB")
+        if 'profile' in result:
+            print(result['profile'])
+
+def writeReports(results, path):
+    if path:
+        with open(path, 'w') as f:
+            json.dump(results if len(results) != 1 else results[0], f, indent=2, default=str)
+
+def loadRooms(path):
+    if not path:
+        return None
+    from rooms import readRooms
+    return readRooms(path)
+
+def loadConstraints(sections, unavailable):
+    if not sections and not unavailable:
+        return None
+    from constraints import readConstraints
+    return readConstraints(sections, unavailable)
+
+def outputName(path, format):
+    """Output file name for input path, with the extension of format (xlsx by default)"""
+    return os.path.splitext(os.path.basename(path))[0] + '.' + (format or 'xlsx')
+
+def scheduleCommand(args):
+    finals = loadFinals(args.finals)
+    rooms = loadRooms(args.rooms)
+    constraints = loadConstraints(args.sections, args.unavailable)
+
+    if not os.path.isdir(args.input):
+        result = runSchedule(args.input, finals, args.max_tests, args.strategy,
+                             args.output, not args.quiet, args.profile, not args.no_cache,
+                             args.max_days, args.time_budget, args.improve, args.merge, rooms, constraints,
+                             args.format, args.start_date, args.slot_times)
+        report(result, args.max_days, args.profile is not None)
+        writeReports([result], args.report)
+        return 0
+
+    # A directory of term CSVs (or Parquet files), one output spreadsheet per term
+    paths = sorted(os.path.join(args.input, name) for name in os.listdir(args.input)
+                   if name.lower().endswith(('.csv', '.parquet', '.pq')))
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    failed = False
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for path in paths:
+            output = None
+            if args.output:
+                output = os.path.join(args.output, outputName(path, args.format))
+            futures[pool.submit(runSchedule, path, finals, args.max_tests, args.strategy,
+                                output, False, args.profile, not args.no_cache,
+                                args.max_days, args.time_budget, args.improve, args.merge, rooms,
+                                constraints, args.format, args.start_date, args.slot_times)] = path
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f'{futures[future]}: failed ({e})', file=sys.stderr)
+                failed = True
+                continue
+            report(result, args.max_days, args.profile is not None)
+            results.append(result)
+    writeReports(results, args.report)
+    return 1 if failed else 0
+
+def printJob(job):
+    spec = job['spec']
+    line = f"{job['id']:>4} {job['status']:<9} {spec['input']}"
+    if job['status'] == 'done':
+        results = job['result']['results']
+        line += f" -> {spec['output']}: {results['slots']} slots over {results['days']} days"
+    elif job['error']:
+        line += f": {job['error']}"
+    if 'seconds' in job:
+        line += f" ({job['seconds']:.1f} s)"
+    print(line)
+
+def jobsCommand(args):
+    from batchJobs import JobQueue
+
+    queue = JobQueue(args.db)
+    try:
+        if args.action == 'submit':
+            for path in args.inputs:
+                output = args.output
+                if output and len(args.inputs) > 1:
+                    # One spreadsheet per input inside the output directory
+                    os.makedirs(output, exist_ok=True)
+                    output = os.path.join(output, outputName(path, args.format))
+                id = queue.submit(path, args.finals, args.max_tests, args.max_days, output, args.strategy,
+                                  args.time_limit, args.time_budget, args.improve, args.merge, not args.no_cache,
+                                  args.rooms, args.sections, args.unavailable, args.format, args.start_date,
+                                  args.slot_times)
+                print(f'{id:>4} queued    {path}')
+        elif args.action == 'run':
+            ids = queue.run(args.workers, printJob)
+            return 1 if any(queue.job(id)['status'] != 'done' for id in ids) else 0
+        elif args.action == 'list':
+            for job in queue.jobs(args.status):
+                printJob(job)
+        elif args.action == 'show':
+            job = queue.job(args.id)
+            if job is None:
+                print(f'No job {args.id}', file=sys.stderr)
+                return 1
+            print(json.dumps(job, indent=2, default=str))
+        elif args.action in ('cancel', 'retry'):
+            done = queue.cancel(args.id) if args.action == 'cancel' else queue.retry(args.id, args.stale_after)
+            if not done:
+                print(f"Job {args.id} can't be {'cancelled' if args.action == 'cancel' else 'queued again'}",
+                      file=sys.stderr)
+                return 1
+    finally:
+        queue.close()
+    return 0
+
+def addExportArguments(parser):
+    # Kept in step with exporters.EXPORTERS, which isn't imported so `--help` stays instant
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'json', 'jsonl', 'ics'], default=None,
+                        help='Output format, by default from the output extension: xlsx spreadsheet, csv or json '
+                             'schedule, jsonl of every student\'s exams, or ics for a directory of one calendar '
+                             'per student')
+    parser.add_argument('--start-date', help='Date of the first exam day (YYYY-MM-DD, default today), exam days '
+                                             'skip weekends')
+    parser.add_argument('--slot-times', help='Start time of each slot of a day, e.g. 09:00,11:30,14:00,16:30 '
+                                             '(default every 2.5 hours from 09:00)')
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog='finals_scheduler', description='Simmons University finals schedule generator')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    schedule = commands.add_parser('schedule', help='Generate a finals schedule from an enrollment CSV')
+    schedule.add_argument('input', help='Enrollment CSV or Parquet file, or a directory of them to schedule in parallel')
+    schedule.add_argument('--max-tests', type=int, default=4, help='Exam slots per day (default 4)')
+    schedule.add_argument('--max-days', type=int, default=4, help='Days available for exams (default 4)')
+    schedule.add_argument('--finals', default=FINALS_DEFAULTS, help='JSON of majors/courses with finals')
+    schedule.add_argument('--strategy', default='greedy', choices=availableStrategies(),
+                          help='Placement strategy (default greedy), exact is only offered with ortools installed')
+    schedule.add_argument('--time-budget', type=float, default=None,
+                          help='Seconds multistart (default 30) or the exact solver (default 120) keep searching')
+    schedule.add_argument('--improve', type=float, nargs='?', const=10, default=None, metavar='SECONDS',
+                          help='Run the local search pass that tries to empty the last days (default 10 s)')
+    schedule.add_argument('--merge', action='store_true',
+                          help='Schedule same-time sections of a course, and sections whose conflicts are a subset '
+                               "of another's, as one node")
+    schedule.add_argument('--rooms', help='CSV of exam rooms (Room, Capacity, optional Building), limits the '
+                                          'students per slot and fills the Room column')
+    schedule.add_argument('--sections', help='CSV of CourseSection with optional Instructor and Online columns')
+    schedule.add_argument('--unavailable', help='CSV of Instructor, Day and optional Slot they are unavailable')
+    schedule.add_argument('-o', '--output', help='Output file (or directory for a directory input), omit to skip export')
+    addExportArguments(schedule)
+    schedule.add_argument('--workers', type=int, default=None, help='Processes for a directory input')
+    schedule.add_argument('-q', '--quiet', action='store_true', help="Don't print the full schedule")
+    schedule.add_argument('--profile', nargs='?', const='', choices=['', 'cprofile', 'tracemalloc', 'all'],
+                          help='Print stage times and counters, optionally with a cProfile and/or tracemalloc capture')
+    schedule.add_argument('--no-cache', action='store_true',
+                          help='Always parse the CSV instead of using the on-disk enrollment cache')
+    schedule.add_argument('--report', help='Write the structured run report(s) to this JSON file')
+    schedule.set_defaults(func=scheduleCommand)
+
+    jobs = commands.add_parser('jobs', help='Queue enrollment files and run them as batch jobs')
+    jobs.add_argument('--db', default=None, help='SQLite file of the job queue (default $FINALS_JOBS_DB or '
+                                                 'finals_jobs.sqlite)')
+    actions = jobs.add_subparsers(dest='action', required=True)
+    submit = actions.add_parser('submit', help='Queue one job per enrollment file')
+    submit.add_argument('inputs', nargs='+', help='Enrollment CSV or Parquet files')
+    submit.add_argument('--max-tests', type=int, default=4, help='Exam slots per day (default 4)')
+    submit.add_argument('--max-days', type=int, default=4, help='Days available for exams (default 4)')
+    submit.add_argument('--finals', default=FINALS_DEFAULTS, help='JSON of majors/courses with finals')
+    submit.add_argument('--strategy', default='greedy', choices=availableStrategies(), help='Placement strategy, as for schedule')
+    submit.add_argument('--time-limit', type=float, default=None, help='Seconds before the job is stopped')
+    submit.add_argument('--time-budget', type=float, default=None, help='Search budget, as for schedule')
+    submit.add_argument('--improve', type=float, nargs='?', const=10, default=None, metavar='SECONDS',
+                        help='Run the local search pass (default 10 s)')
+    submit.add_argument('--merge', action='store_true', help='Merge sections, as for schedule')
+    submit.add_argument('--rooms', help='CSV of exam rooms, as for schedule')
+    submit.add_argument('--sections', help='CSV of section instructors and online flags, as for schedule')
+    submit.add_argument('--unavailable', help='CSV of instructor unavailability, as for schedule')
+    submit.add_argument('--no-cache', action='store_true', help="Don't use the on-disk enrollment cache")
+    submit.add_argument('-o', '--output', help='Output file (a directory for several inputs), '
+                                               'defaults to the input with the extension of --format')
+    addExportArguments(submit)
+    run = actions.add_parser('run', help='Run queued jobs until none are left')
+    run.add_argument('--workers', type=int, default=None, help='Jobs run at once (default: one per CPU)')
+    listing = actions.add_parser('list', help='Show jobs and their status')
+    listing.add_argument('--status', choices=['queued', 'running', 'done', 'failed', 'timeout', 'cancelled'])
+    for action, text in (('show', 'Print a job with its full report'), ('cancel', 'Cancel a queued job'),
+                         ('retry', 'Queue a job again')):
+        actions.add_parser(action, help=text).add_argument('id', type=int)
+    actions.choices['retry'].add_argument('--stale-after', type=float, default=None, metavar='SECONDS',
+                                          help='Also queue the job again if it is running but started more than '
+                                               'this long ago, e.g. after the runner was killed')
+    jobs.set_defaults(func=jobsCommand)
+    return parser
+
+def main(argv=None):
+    args = buildParser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
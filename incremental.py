@@ -0,0 +1,76 @@
+import numpy as np
+
+from conflictEngine import ConflictEngine
+
+class IncrementalScheduler:
+    """Greedy schedule kept in memory so course finals toggles and maxTests changes
+    only re-place the sections they affect instead of rebuilding from the CSV.
+
+    Sections are placed in the enrollment's popularity order, so a section's slot
+    only depends on the sections before it. A toggle takes out the sections
+    placed from the first toggled one on and places them again, a maxTests
+    change places everything again. Equally popular sections keep the
+    enrollment's order rather than selectFinals' re-sort, so the day count may
+    differ slightly from buildSchedule's for the same finals"""
+
+    def __init__(self, enrollment, courses: dict, maxTests: int):
+        self.enrollment = enrollment
+        self.maxTests = maxTests
+        # Course records of every section, shared by each placement
+        self.base = ConflictEngine(enrollment, maxTests)
+
+        # KEY: Course name
+        # VALUE: Ids of its sections
+        self.sections = {}
+        for c, name in enumerate(enrollment.names):
+            self.sections.setdefault(str(name), []).append(c)
+        # Per section id, whether it has a final and whether it is placed in the engine
+        self.active = np.zeros(len(enrollment), dtype=bool)
+        self.placed = np.zeros(len(enrollment), dtype=bool)
+        self.update(courses)
+        self.engine = self.base.empty()
+        # Sections placed by the last update, for instrumentation
+        self.replaced = 0
+
+    @property
+    def schedule(self):
+        # Placed on read, so a whole major's toggles are placed once
+        if (self.active != self.placed).any():
+            self.replace()
+        return self.engine.schedule
+
+    @property
+    def days(self):
+        return -(-len(self.schedule) // self.maxTests)
+
+    def update(self, courses: dict):
+        """Apply a full course -> has final mapping, only the differences are re-placed"""
+        for name, hasFinal in courses.items():
+            self.setCourse(name, hasFinal)
+
+    def setCourse(self, name: str, hasFinal: bool):
+        if name in self.sections:
+            self.active[self.sections[name]] = hasFinal
+
+    def setMaxTests(self, maxTests: int):
+        """Day boundaries move, so every active section is placed again.
+        The course records are kept"""
+        if maxTests != self.maxTests:
+            self.maxTests = self.base.maxTests = maxTests
+            self.engine = self.base.empty()
+            self.placed[:] = False
+
+    def replace(self):
+        """Take out the sections placed from the first changed one on, and place
+        the active ones from there"""
+        first = int(np.flatnonzero(self.active != self.placed)[0])
+        # Latest first, so every slot is left as it was before they were placed.
+        # Taking a section out costs far less than placing it
+        for c in reversed(np.flatnonzero(self.placed[first:]) + first):
+            self.engine.remove(self.enrollment.courses[c])
+        self.engine.trim()
+        placing = np.flatnonzero(self.active[first:]) + first
+        for c in placing:
+            self.engine.firstFit(self.enrollment.courses[c])
+        self.placed[:] = self.active
+        self.replaced = len(placing)
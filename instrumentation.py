@@ -0,0 +1,130 @@
+import io
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Set to 'cprofile', 'tracemalloc' or 'all' to capture profiles without code changes
+PROFILE_ENV = 'FINALS_PROFILE'
+
+class Instrumentation:
+    """Stage timers, counters and optional cProfile/tracemalloc capture for one
+    generation run. report() returns everything as a plain dict"""
+
+    def __init__(self, profile=None):
+        if profile is None:
+            profile = os.environ.get(PROFILE_ENV, '')
+        profile = profile.lower()
+        self.cprofile = profile in ('cprofile', 'all')
+        self.tracemalloc = profile in ('tracemalloc', 'all')
+
+        # KEY: Stage name
+        # VALUE: Seconds spent, in the order stages ran
+        self.stages = {}
+        self.counters = Counter()
+        # Slots probed per course before it was placed
+        self.attempts = {}
+        self.results = {}
+        self.profileText = None
+        self.memory = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def recordEngine(self, engine):
+        """Copy the placement counters kept by a ConflictEngine"""
+        self.count('conflictChecks', engine.checks)
+        self.count('slotsProbed', sum(engine.probes))
+        self.attempts = dict(zip(map(str, engine.enrollment.courses), engine.probes))
+
+    @contextmanager
+    def capture(self):
+        """Run the block under cProfile and/or tracemalloc if enabled"""
+        profiler = None
+        if self.cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if self.tracemalloc:
+            import tracemalloc
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                import pstats
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(20)
+                self.profileText = out.getvalue()
+            if self.tracemalloc:
+                import tracemalloc
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.memory = {'peakMB': round(peak / 2**20, 2),
+                               'top': [str(stat) for stat in snapshot.statistics('lineno')[:10]]}
+
+    def report(self):
+        attempts = sorted(self.attempts.items(), key=lambda item: item[1], reverse=True)
+        report = {'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                  'total': round(sum(self.stages.values()), 4),
+                  'counters': dict(self.counters),
+                  'attempts': {'courses': len(attempts),
+                               'mean': round(sum(self.attempts.values()) / len(attempts), 2) if attempts else 0,
+                               'max': attempts[0][1] if attempts else 0,
+                               'worst': attempts[:5]},
+                  'results': dict(self.results)}
+        if self.profileText is not None:
+            report['profile'] = self.profileText
+        if self.memory is not None:
+            report['memory'] = self.memory
+        return report
+
+    def summary(self):
+        """Short readable version of the report for the wizard and the CLI"""
+        report = self.report()
+        lines = []
+        if 'slots' in report['results']:
+            lines.append(f"{report['results']['slots']} slots over {report['results']['days']} days "
+                         f"for {report['attempts']['courses']} course sections in {report['total']:.2f} s")
+            if 'backToBack' in report['results']:
+                lines.append(f"{report['results']['backToBack']:,} students with back-to-back exams")
+            if 'analytics' in report['results']:
+                analytics = report['results']['analytics']
+                lines.append(f"{analytics['doubleDays']:,} students with 2+ exams in a day, "
+                             f"busiest slot {max(analytics['slotHeadcounts'], default=0):,} students")
+                if analytics['exceeded']:
+                    lines.append(f"{len(analytics['overflow'])} courses past day {analytics['maxDays']}")
+            if 'nodes' in report['results']:
+                lines.append(f"Sections merged into {report['results']['nodes']} nodes "
+                             f"from {report['results']['sections']}")
+            if 'exact' in report['results']:
+                exact = report['results']['exact']
+                lines.append(f"Exact solver: {exact['status'].lower()}"
+                             + (f", lower bound {exact['lowerBound']} days" if 'lowerBound' in exact else ''))
+            if 'rooms' in report['results']:
+                lines.append(f"Rooms assigned to {len(report['results']['rooms'])} sections"
+                             + (f", {len(report['results']['unassigned'])} without enough seats"
+                                if report['results']['unassigned'] else ''))
+            if 'daysSaved' in report['results']:
+                lines.append(f"Local search saved {report['results']['daysSaved']} days "
+                             f"({report['results']['slotsSaved']} slots)")
+        lines.append('Stages: ' + ', '.join(f'{name} {seconds:.3f} s' for name, seconds in report['stages'].items()))
+        counters = report['counters']
+        if counters:
+            lines.append('Counters: ' + ', '.join(f'{name} {value:,}' for name, value in sorted(counters.items())))
+        if report['attempts']['worst']:
+            course, n = report['attempts']['worst'][0]
+            lines.append(f"Slots probed per course: mean {report['attempts']['mean']}, most {n} ({course})")
+        if 'memory' in report:
+            lines.append(f"Peak traced memory: {report['memory']['peakMB']} MB")
+        return '\n'.join(lines)
@@ -0,0 +1,136 @@
+import time
+
+# Seconds the improvement pass may run
+DEFAULT_LIMIT = 10
+# Iterations a relocated course stays fixed so the search doesn't undo its own moves
+TABU_TENURE = 7
+# Perturbing moves in a row without emptying a slot before giving up
+MAX_STALL = 200
+
+class LocalSearch:
+    """Post-pass that tries to empty the trailing slot of a placed ConflictEngine,
+    then the one before it, and so on. Courses are moved to earlier slots or
+    swapped along Kempe chains, and when stuck courses blocking the trailing
+    ones are moved elsewhere and kept tabu for a few iterations.
+
+    Every move goes through the engine's remove/place. The per-day counts change
+    only for the moved course's students, the union bitmask of the slot it leaves
+    is rebuilt from the courses still in that slot"""
+
+    def __init__(self, engine, timeLimit=DEFAULT_LIMIT, tenure=TABU_TENURE):
+        self.engine = engine
+        self.timeLimit = timeLimit
+        self.tenure = tenure
+        # KEY: Course name
+        # VALUE: Iteration until which it may not be moved by a perturbation
+        self.tabu = {}
+        self.iteration = 0
+        self.moves = 0
+        self.kempeSwaps = 0
+
+    def size(self, course):
+        return len(self.engine.record(course).students)
+
+    def mask(self, course):
+        return self.engine.record(course).mask
+
+    def moveTo(self, course, slots):
+        """Move course to the first slot in slots where it fits, False leaves it where it was"""
+        old = self.engine.remove(course)
+        for i in slots:
+            if i != old and self.engine.canPlace(course, i):
+                self.engine.place(course, i)
+                self.moves += 1
+                return True
+        self.engine.place(course, old)
+        return False
+
+    def kempeChain(self, course, a, b):
+        """Courses of slot a and slot b linked to course by shared students, in slot order"""
+        chainA, chainB = [course], []
+        maskA, maskB = self.mask(course), 0
+        while True:
+            newB = [other for other in self.engine.schedule[b] if other not in chainB and self.mask(other) & maskA]
+            for other in newB:
+                maskB |= self.mask(other)
+            chainB += newB
+            newA = [other for other in self.engine.schedule[a] if other not in chainA and self.mask(other) & maskB]
+            if not newA:
+                return chainA, chainB
+            for other in newA:
+                maskA |= self.mask(other)
+            chainA += newA
+
+    def kempeSwap(self, course, last):
+        """Swap the Kempe chain of course between the trailing slot and an earlier one,
+        only if fewer students end up in the trailing slot"""
+        for b in range(last):
+            chainA, chainB = self.kempeChain(course, last, b)
+            if sum(map(self.size, chainB)) >= sum(map(self.size, chainA)):
+                continue
+            for other in chainA + chainB:
+                self.engine.remove(other)
+            moved = []
+            for other, target in [(c, b) for c in chainA] + [(c, last) for c in chainB]:
+                if not self.engine.canPlace(other, target):
+                    break
+                self.engine.place(other, target)
+                moved.append(other)
+            else:
+                self.kempeSwaps += 1
+                return True
+            # Day limits broke the swap, put everything back
+            for other in moved:
+                self.engine.remove(other)
+            for other in chainA:
+                self.engine.place(other, last)
+            for other in chainB:
+                self.engine.place(other, b)
+        return False
+
+    def perturb(self, last):
+        """Move courses that share students with the smallest trailing course out of
+        the earlier slot with the fewest of them, so it may fit there next iteration"""
+        course = min(self.engine.schedule[last], key=self.size)
+        mask = self.mask(course)
+        options = []
+        for j in range(last):
+            blockers = [other for other in self.engine.schedule[j] if self.mask(other) & mask]
+            if blockers and all(self.tabu.get(other, -1) < self.iteration for other in blockers):
+                options.append((sum(map(self.size, blockers)), j, blockers))
+        moved = False
+        for _, j, blockers in sorted(options):
+            for other in blockers:
+                if self.moveTo(other, range(last)):
+                    self.tabu[other] = self.iteration + self.tenure
+                    moved = True
+            if moved:
+                break
+        return moved
+
+    def run(self):
+        """Improve the engine's schedule in place, returns the number of slots saved"""
+        engine = self.engine
+        deadline = time.perf_counter() + self.timeLimit
+        start = len(engine.schedule)
+        stall = 0
+        while len(engine.schedule) > 1 and time.perf_counter() < deadline and stall < MAX_STALL:
+            self.iteration += 1
+            last = len(engine.schedule) - 1
+            progress = False
+            # Small courses first, they are the easiest to fit somewhere else
+            for course in sorted(engine.schedule[last], key=self.size):
+                # Earlier swaps may already have moved it
+                if engine.slotOf(course) != last:
+                    continue
+                if self.moveTo(course, range(last)) or self.kempeSwap(course, last):
+                    progress = True
+            if not engine.schedule[last]:
+                engine.trim()
+                stall = 0
+            elif not progress:
+                if not self.perturb(last):
+                    break
+                stall += 1
+        engine.trim()
+        return start - len(engine.schedule)
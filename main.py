@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 from PyQt6.QtWidgets import QApplication, QWizard
 
@@ -10,9 +11,9 @@ WIZARD_PAGES = [['Introduction', Introduction],
                 ['Review Information', ReviewInfo],
                 ['Generate Schedule', GenerateSchedule]]
 
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
-
+def buildWizard(app):
+    """Wizard with every page added. Pages only build their widgets and load the
+    scheduler when first shown, so this stays cheap"""
     # Create QWizard instance
     wizard = QWizard()
     wizard.setWindowTitle('Simmons University Finals Exam Schedule Wizard')
@@ -25,6 +26,13 @@ if __name__ == '__main__':
     for index in range(len(WIZARD_PAGES)):
         wizardPage = WIZARD_PAGES[index][1]
         wizard.addPage(wizardPage(pageTitles, index))
+    return wizard
+
+if __name__ == '__main__':
+    # Spawned multistart workers of a frozen build run their task instead of another wizard
+    multiprocessing.freeze_support()
+    app = QApplication(sys.argv)
+    wizard = buildWizard(app)
 
     # Show the wizard and run event loop
     wizard.show()
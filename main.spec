@@ -0,0 +1,42 @@
+# PyInstaller build of the wizard as a folder (onedir) instead of one file:
+#
+#     pyinstaller main.spec
+#
+# A one-file build unpacks everything to a temp folder on every launch, the
+# folder build starts straight from dist/FinalsScheduler. Imports inside
+# functions are still found, so the lazily loaded scheduler modules are bundled.
+
+# Never imported by the wizard, but pulled in by pandas/numpy optional imports
+EXCLUDES = ['tkinter', 'matplotlib', 'IPython', 'jupyter', 'notebook', 'scipy', 'pytest',
+            'numpy.tests', 'pandas.tests', 'jinja2', 'sqlalchemy', 'tables',
+            'PyQt6.QtQml', 'PyQt6.QtQuick', 'PyQt6.QtWebEngineCore', 'PyQt6.QtMultimedia', 'PyQt6.QtPdf']
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('res/courseFinals.json', 'res')],
+    hiddenimports=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='FinalsScheduler',
+    console=False,
+    upx=False,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    name='FinalsScheduler',
+)
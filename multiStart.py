@@ -0,0 +1,106 @@
+import os
+import time
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+import numpy as np
+
+from conflictEngine import ConflictEngine
+
+# Randomized greedy passes tried before giving up on fitting in maxDays
+DEFAULT_STARTS = 64
+# Seconds to keep searching, None searches until every start has run
+DEFAULT_BUDGET = 30
+
+# Read-only data of the process running starts, set once by initWorker
+# so the enrollment isn't pickled for every task
+_shared = {}
+
+def initWorker(enrollment, maxTests, rooms=None, constraints=None, sectionSeats=None):
+    _shared['engine'] = ConflictEngine(enrollment, maxTests, rooms, constraints, sectionSeats)
+    _shared['sizes'] = np.asarray(enrollment.rows)
+    _shared['degree'] = np.asarray(enrollment.conflictGraph().degree)
+
+def startOrder(seed):
+    """Placement order of course ids for one start.
+    Seed 0 is the plain greedy order (most popular first), odd seeds shuffle
+    courses with the same popularity and even seeds order by conflict degree
+    with random weights, so a busy course tends to go early but not always"""
+    sizes, degree = _shared['sizes'], _shared['degree']
+    if seed == 0:
+        return np.arange(len(sizes))
+    rng = np.random.default_rng(seed)
+    if seed % 2:
+        # lexsort sorts by the last key first
+        return np.lexsort((rng.random(len(sizes)), -sizes))
+    weights = (degree + 1) * rng.uniform(0.5, 1.5, len(degree))
+    return np.lexsort((-sizes, -weights))
+
+def runStart(seed):
+    """Greedy first fit in the order of one start, returns (score, seed, order).
+    Scores compare by slots used, then days, then students with back-to-back exams"""
+    engine = _shared['engine'].empty()
+    order = startOrder(seed)
+    courses = engine.enrollment.courses
+    for c in order:
+        engine.firstFit(courses[c])
+    slots = len(engine.schedule)
+    score = (slots, -(-slots // engine.maxTests), engine.backToBack())
+    return score, seed, order
+
+def multiStart(enrollment, maxTests, maxDays=None, timeBudget=DEFAULT_BUDGET,
+               starts=DEFAULT_STARTS, workers=None, progress=None, rooms=None,
+               constraints=None, sectionSeats=None):
+    """Run up to starts randomized greedy passes and return (score, order, runs) of the best.
+    Stops early once a schedule fits in maxDays or timeBudget seconds have passed.
+    progress(finished, starts) is called after every start and may raise to stop.
+    rooms, constraints and sectionSeats limit the slots as in ConflictEngine"""
+    workers = min(workers or os.cpu_count() or 1, starts)
+    deadline = None if timeBudget is None else time.perf_counter() + timeBudget
+    best = None
+    runs = 0
+
+    def done():
+        if best is not None and maxDays is not None and best[0][1] <= maxDays:
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
+
+    if workers == 1:
+        # Not worth starting processes
+        initWorker(enrollment, maxTests, rooms, constraints, sectionSeats)
+        try:
+            for seed in range(starts):
+                result = runStart(seed)
+                runs += 1
+                best = min(best, result) if best else result
+                if progress:
+                    progress(runs, starts)
+                if done():
+                    break
+        finally:
+            _shared.clear()
+        return best[0], best[2], runs
+
+    # Spawned, not forked, so this also works from the wizard's worker thread
+    pool = ProcessPoolExecutor(workers, get_context('spawn'), initWorker,
+                               (enrollment, maxTests, rooms, constraints, sectionSeats))
+    try:
+        seeds = iter(range(starts))
+        # Only a few starts are queued at a time so stopping early doesn't wait on the rest
+        pending = {pool.submit(runStart, seed) for seed in islice(seeds, 2 * workers)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                runs += 1
+                best = min(best, result) if best else result
+                if progress:
+                    progress(runs, starts)
+            if done():
+                break
+            for seed in islice(seeds, len(finished)):
+                pending.add(pool.submit(runStart, seed))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return best[0], best[2], runs
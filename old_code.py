@@ -6,164 +6,151 @@
 import numpy as np
 import pandas as pd
 
-from excelExport import exportExcel
-
-def cleanDF(df, courses):
-    df = df.dropna()
-    # Labs match the below pattern with a Course code, 3 numbers, and an L
-    pattern = r'\w+ \d+L-.*'
-    df = df[~df['CourseSection'].str.contains(pattern)]
-    df = df[~df['CourseSection'].str.contains('SIM')]
-    df = df[~df['CourseSection'].str.contains('CR')]
+from analytics import scheduleAnalytics
+from conflictEngine import ConflictEngine
+from conflictGraph import colorGraph
+from enrollment import Enrollment, filterSections, ingestDF, selectFinals
+from exporters import exportSchedule
+from instrumentation import Instrumentation
+from strategies import STRATEGIES
+
+class GenerationCancelled(Exception):
+    """Raised from a progress callback to stop generation before it finishes"""
+
+def placeCourses(engine, enrollment, strategy, progress=None, maxDays=None, timeBudget=None, instrumentation=None):
+    if strategy == 'multistart':
+        from multiStart import DEFAULT_BUDGET, multiStart
+        # Orderings are tried in worker processes, the best one is replayed here
+        _, order, runs = multiStart(enrollment, engine.maxTests, maxDays,
+                                    DEFAULT_BUDGET if timeBudget is None else timeBudget, progress=progress,
+                                    rooms=engine.rooms, constraints=engine.constraints,
+                                    sectionSeats=engine.sectionSeats)
+        for c in order:
+            engine.firstFit(enrollment.courses[c])
+        if instrumentation:
+            instrumentation.count('starts', runs)
+    elif strategy == 'exact':
+        from exactSolver import DEFAULT_LIMIT, solveExact
+        # The greedy schedule is the starting point and bounds the slots the solver considers
+        placeCourses(engine, enrollment, 'greedy')
+        # Improvements go to the results instead of stdout, this may run on the wizard's worker thread
+        result = solveExact(engine, DEFAULT_LIMIT if timeBudget is None else timeBudget, progress=progress,
+                            log=None)
+        if instrumentation:
+            instrumentation.results.update(exact=result)
+    elif strategy == 'greedy':
+        # Courses are ordered most popular (most students) first
+        for placed, course in enumerate(enrollment.courses, 1):
+            # Starting at 0 to ensure students get the earliest possible slot
+            engine.firstFit(course)
+            if progress:
+                progress(placed, len(enrollment))
+    elif strategy in STRATEGIES:
+        # Student overlaps are computed once up front instead of per slot tried
+        colorGraph(enrollment.conflictGraph(), engine, strategy, progress)
+    else:
+        raise ValueError(f'Unknown scheduling strategy: {strategy}')
+    return engine.schedule
+
+def toEnrollment(data, stats):
+    """Enrollment of data, which is an Enrollment, a DataFrame read from the CSV or a file path.
+    DataFrames go through the same section filtering readEnrollment applies"""
+    if isinstance(data, Enrollment):
+        stats.count('enrollmentReused')
+        return data
+    if isinstance(data, pd.DataFrame):
+        # Labs, SIM and CR sections never get a final
+        with stats.stage('filter'):
+            data = filterSections(data)
+        # Integer-encoded courses, class times and course -> student index
+        with stats.stage('groups'):
+            return ingestDF(data)
+    from enrollmentCache import loadEnrollment
+    return loadEnrollment(data, instrumentation=stats)
+
+def buildSchedule(data, courses, maxTests, strategy='greedy', progress=None, instrumentation=None,
+                  maxDays=None, timeBudget=None, improveTime=None, merge=False, rooms=None, constraints=None):
+    """Schedule every course with a final, returns a list of course lists per timeslot.
+    progress(placed, total) is called after every placed course (every run for
+    multistart) and may raise GenerationCancelled to stop early. Stage times and
+    counters go to instrumentation, and the schedule's analytics (see analytics)
+    to its results. maxDays and timeBudget (seconds) stop the
+    multistart search early, timeBudget also limits the exact solver. improveTime (seconds) runs the local search
+    pass that tries to empty the last slots. merge schedules sections that can
+    always share a slot as one node (see sectionMerge). With rooms (see rooms.readRooms)
+    no slot holds more students than the rooms seat, and the room of every
+    section goes to the results as 'rooms'. constraints (see constraints.readConstraints)
+    add instructors, their unavailable slots and online finals, which need no room"""
+    stats = instrumentation or Instrumentation()
+
+    # Import CSV of SID and Courses, unless the wizard already parsed it
+    data = toEnrollment(data, stats)
     # Remove classes that don't need final exams
-    filter = [key for key, _ in courses.items() if courses[key]]
-    df['CourseName'] = df['CourseSection'].str.extract(r'(\w* \d{3})')
-    df = df[df['CourseName'].isin(filter)]
-    
-    return df
-
-def createTimeslotGroups(df):
-    df = df.drop('SID', axis=1).drop_duplicates().groupby(['Time Slot'], as_index=False)
-    times = {}
-    # Dictionary of timeslot per course
-    for time, frame in df:
-        for index, course in frame.iterrows():
-            # KEY: Course ID
-            # VALUE: Timeslot
-            times[course['CourseSection']] = time[0]
-    return times
-
-def createStudentGroups(df, pop):
-    courses = {}
-    # Dictionary of students per course
-    for course in pop:
-        # Get a df of all students in a class
-        students = df.loc[df['CourseSection'] == course]['SID']
-        # KEY: Course ID
-        # VALUE: Set of student
-        courses[course] = set(students.to_numpy().flatten())
-    return courses
-
-def checkStudentConflicts(students, tests, i, max):
-    for s in students:
-        # If student has more than 2 tests in a day
-        if s in tests[i // max] and tests[i // max][s] == 2:
-            # Conflict found
-            return True 
-    # No conflicts
-    return False 
-
-def checkCourseTiming(times, schedule, c, i):
-    currentTime = times[c]
-    # For every course already in timeslot
-    for otherCourse in schedule[i]:
-        previousTime = times[otherCourse]
-        # If times aren't the same
-        if currentTime != previousTime:
-            return True
-    # All the same time
-    return False
-
-def checkRepeatedStudents(students, schedule, c, i):
-    # Keep track of all student sets and number of students
-    scheduledStudents = []
-    totalStudents = 0
-    # Students from unscheduled class
-    scheduledStudents.append(students[c])
-    totalStudents += len(students[c])
-
-    for otherCourse in schedule[i]:
-        # Students from previously scheduled classes
-        scheduledStudents.append(students[otherCourse])
-        totalStudents += len(students[otherCourse])
-    
-    # If the union of all student sets has repeats, 
-    # it will be smaller than the total number of students
-    if len(set.union(*scheduledStudents)) < totalStudents:
-        # Repeats found
-        return True
-    # No repeats found
-    return False
-
-def updateStudentTests(students, tests, i, max):
-    for s in students:
-        tests[i // max][s] = tests[i // max].get(s, 0) + 1
-    return tests
-
-def generationStart(path, courses, maxTests, maxDays):
-    # Import CSV of SID and Courses
-    df = cleanDF(pd.read_csv(path), courses)
-    courseTimes = createTimeslotGroups(df)
-
-    # Array of most popular courses (most students)
-    popularCourses = (df.groupby(['CourseSection'], sort=False)
-                      .agg(NumStudents=('SID', 'count'))
-                      .sort_values('NumStudents', ascending=False)
-                      .index.to_numpy())
-    courseStudent = createStudentGroups(df, popularCourses)
-
-    # An array of exams, each index represents 1 timeslot
-    schedule = []
-    # To keep track of how many exams students have per day
-    studentTests = {}
-
-    for course in popularCourses:
-        # The starting index for the schedule
-        # Starting at 0 to ensure students get the earliest possible slot
-        index = 0
-        added = False
-        students = courseStudent[course]
-
-        while not added:
-            # If the current day doesn't exist in studentTests
-            if index // maxTests not in studentTests:
-                studentTests[index // maxTests] = {}
-
-            ### CASE 0: INDEX DOES NOT EXIST
-            if index + 1 > len(schedule):
-                studentConflict = checkStudentConflicts(students, studentTests, index, maxTests)
-                if not studentConflict:
-                    # Append course in list, as it is first item in index
-                    schedule.append([course])
-                    studentTests = updateStudentTests(students, studentTests, index, maxTests)
-                    added = True
-                else:
-                    # Append a new empty list, to skip over index
-                    schedule.append([])
-            
-            ### CASE 1: INDEX IS EMPTY
-            elif len(schedule[index]) == 0:
-                studentConflict = checkStudentConflicts(students, studentTests, index, maxTests)
-                if not studentConflict:
-                    # Append course in list, as it is first item in index
-                    schedule[index].append(course)
-                    studentTests = updateStudentTests(students, studentTests, index, maxTests)
-                    added = True
-
-            ### CASE 2: INDEX NOT EMPTY
-            # If there are items in current index
-            elif len(schedule[index]) > 0:
-                differentTime = checkCourseTiming(courseTimes, schedule, course, index)
-                studentConflict = checkStudentConflicts(students, studentTests, index, maxTests)
-                # If all times are same or no conflicts, add to schedule
-                ### CASE 2A: CLASS TIMES ARE THE SAME
-                if not differentTime and not studentConflict:
-                    # Add to schedule
-                    schedule[index].append(course)
-                    studentTests = updateStudentTests(students, studentTests, index, maxTests)
-                    added = True
-                ### CASE 2B: NO REPEATED STUDENTS DURING TIMESLOT
-                else:
-                    repeatStudents = checkRepeatedStudents(courseStudent, schedule, course, index)
-                    # If no repeat students or conflicts, add to schedule
-                    if not repeatStudents and not studentConflict:
-                        schedule[index].append(course)
-                        studentTests = updateStudentTests(students, studentTests, index, maxTests)
-                        added = True
-
-            ### CASE 2: NO ACCEPTABLE SLOTS FOUND
-            # Add one to index if no slot found
-            index += 1
+    with stats.stage('select'):
+        enrollment = selectFinals(data, courses)
+    compiled = None
+    if constraints is not None:
+        from constraints import compileConstraints
+        # Slot bitmasks and instructor ids per course id
+        with stats.stage('constraints'):
+            compiled = compileConstraints(enrollment, constraints, maxTests)
+        sectionConstraints = compiled
+    if rooms is not None:
+        # A section the rooms can't seat even alone would never find a slot
+        sizes = np.diff(enrollment.indptr) if compiled is None else compiled.seats
+        if len(sizes) and sizes.max() > rooms.total:
+            course = enrollment.courses[int(sizes.argmax())]
+            raise ValueError(f'{course} has {sizes.max()} students, more than the {rooms.total} seats '
+                             'of all rooms together')
+    # Headcounts of the sections behind each node, for seating merged nodes
+    sectionSeats = None
+    if merge:
+        from sectionMerge import expandSchedule, mergeSections
+        with stats.stage('merge'):
+            sections = enrollment
+            seats = np.diff(sections.indptr) if compiled is None else compiled.seats
+            # Sections of a node always fit the rooms together
+            enrollment, members = mergeSections(sections, None if compiled is None else compiled.instructors,
+                                                seats, rooms)
+            sectionSeats = [seats[m] for m in members]
+            if compiled is not None:
+                compiled = compiled.combine(members)
+        stats.results.update(sections=len(sections), nodes=len(enrollment))
+
+    with stats.stage('place'):
+        # Tracks slot occupancy and exams per student per day
+        engine = ConflictEngine(enrollment, maxTests, rooms, compiled, sectionSeats)
+
+        # An array of exams, each index represents 1 timeslot
+        schedule = placeCourses(engine, enrollment, strategy, progress, maxDays, timeBudget, stats)
+    stats.recordEngine(engine)
+
+    if improveTime:
+        from localSearch import LocalSearch
+        with stats.stage('improve'):
+            daysBefore = -(-len(schedule)//maxTests)
+            search = LocalSearch(engine, improveTime)
+            slotsSaved = search.run()
+        stats.count('localMoves', search.moves)
+        stats.count('kempeSwaps', search.kempeSwaps)
+        daysAfter = -(-len(schedule)//maxTests)
+        stats.results.update(slotsSaved=slotsSaved, daysSaved=daysBefore - daysAfter)
+    stats.results.update(slots=len(schedule), days=-(-len(schedule)//maxTests))
+    if merge:
+        # Back to one entry per section for printing and export
+        schedule = expandSchedule(schedule, enrollment, members, sections)
+        enrollment = sections
+
+    with stats.stage('analytics'):
+        analytics = scheduleAnalytics(schedule, enrollment, maxTests, maxDays)
+    stats.results.update(backToBack=analytics['backToBack'], analytics=analytics)
+
+    if rooms is not None:
+        from rooms import assignRooms
+        with stats.stage('rooms'):
+            online = None if constraints is None else enrollment.courses[sectionConstraints.online]
+            assignment, unassigned = assignRooms(schedule, enrollment, rooms, online)
+        stats.results.update(rooms=assignment, unassigned=unassigned)
 
     # Swap 1st and 3rd time slots
     # for i in range(len(schedule)):
@@ -171,6 +158,9 @@ def generationStart(path, courses, maxTests, maxDays):
     #         multiple = i // 4
     #         schedule[multiple + 2], schedule[multiple] = schedule[multiple], schedule[multiple + 2]
 
+    return schedule
+
+def printSchedule(schedule, maxTests):
     ### PRINT THE RESULTS
     for index in range(len(schedule)):
         day = index // maxTests
@@ -179,4 +169,22 @@ def generationStart(path, courses, maxTests, maxDays):
         print(*sorted(schedule[index]))
     print(f'Number of slots used: {len(schedule)}')
 
-    exportExcel(schedule, 4, "final_schedule.xlsx", False, 10)
\ No newline at end of file
+def generationStart(data, courses, maxTests, maxDays, strategy='greedy',
+                    output='final_schedule.xlsx', progress=None, profile=None, timeBudget=None, improveTime=None,
+                    merge=False, rooms=None, constraints=None, format=None, startDate=None, slotTimes=None):
+    """Build the schedule and write it to output, returns the Instrumentation
+    holding stage times, counters and (if profile or FINALS_PROFILE is set) profiles.
+    format is one of exporters.EXPORTERS, by default from the extension of output"""
+    stats = Instrumentation(profile)
+    with stats.capture():
+        # Headcounts and per-student formats need the enrollment, parsed once and shared with the scheduler
+        data = toEnrollment(data, stats)
+        schedule = buildSchedule(data, courses, maxTests, strategy, progress, stats, maxDays, timeBudget, improveTime,
+                                 merge, rooms, constraints)
+
+        # openpyxl is only loaded when a spreadsheet is actually written
+        with stats.stage('export'):
+            exportSchedule(output, schedule, maxTests, data, stats.results, format, startDate=startDate,
+                           slotTimes=slotTimes)
+    stats.results.update(output=str(output), maxDays=maxDays)
+    return stats
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# Required columns of a rooms file, Building is optional
+ROOM_COLUMNS = ['Room', 'Capacity']
+
+class Rooms:
+    """Exam rooms sorted by capacity, smallest first, so the best fitting room
+    for a headcount is one binary search away"""
+
+    def __init__(self, names, capacities):
+        capacities = np.asarray(capacities, dtype=np.int64)
+        order = np.argsort(capacities, kind='stable')
+        self.names = [names[i] for i in order]
+        self.capacities = capacities[order]
+        # Seats of all rooms together, the most students one slot can hold
+        self.total = int(self.capacities.sum())
+
+    def __len__(self):
+        return len(self.names)
+
+    def fits(self, headcounts):
+        """True if allocateRooms seats every one of headcounts (sections of one slot)"""
+        if len(headcounts) > len(self) or sum(headcounts) > self.total:
+            return False
+        return not allocateRooms(self, headcounts)[1]
+
+def readRooms(path):
+    """Rooms from a CSV with Room and Capacity columns and an optional Building column"""
+    df = pd.read_csv(path, dtype={'Room': str, 'Building': str}, skipinitialspace=True)
+    missing = [column for column in ROOM_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing the column(s) {', '.join(missing)}")
+    capacities = pd.to_numeric(df['Capacity'], errors='coerce')
+    if capacities.isna().any() or (capacities <= 0).any():
+        raise ValueError(f'{path} has room capacities that are not positive numbers')
+
+    names = df['Room'].fillna('').str.strip()
+    if 'Building' in df.columns:
+        # Room numbers repeat across buildings
+        buildings = df['Building'].fillna('').str.strip()
+        names = (buildings + ' ' + names).str.strip()
+    return Rooms(names.tolist(), capacities.astype(np.int64).to_numpy())
+
+def allocateRooms(rooms, headcounts):
+    """Best-fit decreasing: the largest section first gets the smallest free room
+    that holds it. A section larger than every free room is split over the largest
+    free rooms. Returns the room indices of each section and the sections
+    that didn't get enough seats because the rooms ran out"""
+    n = len(rooms)
+    # Smallest free room at or above i (above[i]) and largest at or below i (below[i + 1]),
+    # n and 0 are sentinels for none. Taken rooms point past themselves and the
+    # pointers are compressed on lookup, so each lookup is amortized O(log n) at most
+    above = list(range(n + 1))
+    below = list(range(n + 1))
+
+    def find(pointers, i):
+        root = i
+        while pointers[root] != root:
+            root = pointers[root]
+        while pointers[i] != root:
+            pointers[i], i = root, pointers[i]
+        return root
+
+    assigned = [[] for _ in headcounts]
+    short = []
+    for s in np.argsort(-np.asarray(headcounts), kind='stable'):
+        need = int(headcounts[s])
+        while need > 0:
+            room = find(above, int(np.searchsorted(rooms.capacities, need)))
+            if room == n:
+                # Nothing free is big enough, take the largest free room and keep going
+                room = find(below, n) - 1
+                if room < 0:
+                    break
+            above[room] = room + 1
+            below[room + 1] = room
+            assigned[s].append(room)
+            need -= int(rooms.capacities[room])
+        if need > 0:
+            short.append(int(s))
+    return assigned, short
+
+def assignRooms(schedule, enrollment, rooms, online=None):
+    """Rooms for every course of schedule, allocated slot by slot.
+    Courses in online take their final online and get no room.
+    Returns the room names per course (joined with ', ' if split) and the
+    courses without enough seats because the slot's rooms ran out"""
+    # KEY: Course name
+    # VALUE: Course ID
+    ids = {course: c for c, course in enumerate(enrollment.courses)}
+    sizes = np.diff(enrollment.indptr)
+    online = set(online if online is not None else ())
+    assignment = {course: 'Online' for slot in schedule for course in slot if course in online}
+    unassigned = []
+    for slot in schedule:
+        slot = [course for course in slot if course not in online]
+        taken, short = allocateRooms(rooms, [sizes[ids[course]] for course in slot])
+        for course, indices in zip(slot, taken):
+            assignment[course] = ', '.join(rooms.names[room] for room in indices)
+        unassigned += [slot[s] for s in short]
+    return assignment, unassigned
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from conflictGraph import ConflictGraph
+from enrollment import Enrollment
+
+def combine(enrollment, groups):
+    """Enrollment with one super-node per group of course ids (groups[c] is the
+    group of course c). Members never share students, so a super-node's students
+    are the union of its members'. Returns the merged enrollment and the member
+    course ids of every super-node"""
+    groups = np.asarray(groups)
+    numGroups = groups.max() + 1 if len(groups) else 0
+    order = np.argsort(groups, kind='stable')
+    members = np.split(order, np.flatnonzero(np.diff(groups[order])) + 1) if len(groups) else []
+
+    # Popularity is the members' rows together, ranked the same way ingestDF does
+    rows = np.bincount(groups, weights=enrollment.rows, minlength=numGroups).astype(np.intp)
+    popularity = pd.Series(rows).sort_values(ascending=False).index.to_numpy()
+    members = [members[g] for g in popularity]
+    rank = np.empty(numGroups, dtype=np.intp)
+    rank[popularity] = np.arange(numGroups)
+
+    # Named after the most popular member (members keep the input order)
+    lead = np.array([m[0] for m in members], dtype=np.intp)
+    # Super-nodes of sections meeting at different class times get a time code of
+    # their own, so they never count as meeting at the same time as anything else
+    times = np.asarray(enrollment.times)[lead].copy()
+    mixed = 0
+    for g, m in enumerate(members):
+        if len(set(np.asarray(enrollment.times)[m].tolist())) > 1:
+            mixed += 1
+            times[g] = -mixed
+
+    students = [np.sort(np.concatenate([enrollment.studentsOf(c) for c in m])) for m in members]
+    indptr = np.zeros(numGroups + 1, dtype=np.intp)
+    np.cumsum([len(s) for s in students], out=indptr[1:])
+    indices = np.concatenate(students) if students else np.empty(0, dtype=np.intp)
+
+    merged = Enrollment(enrollment.courses[lead], times, enrollment.timeSlots, enrollment.sids,
+                        indptr, indices, enrollment.names[lead], rows[popularity],
+                        np.array([enrollment.firstSeen[m].min() for m in members]))
+
+    # Super-node edges from the member edges, no need to pair up students again
+    graph = enrollment.conflictGraph()
+    edges = rank[groups[graph.edges]]
+    edges.sort(axis=1)
+    keep = edges[:, 0] != edges[:, 1]
+    n = max(numGroups, 1)
+    keys, inverse = np.unique(edges[keep, 0] * n + edges[keep, 1], return_inverse=True)
+    weights = np.bincount(inverse, weights=graph.weights[keep], minlength=len(keys)).astype(np.intp)
+    merged.graph = ConflictGraph(merged, np.stack([keys // n, keys % n], axis=1), weights)
+    return merged, members
+
+def sameTimeGroups(enrollment, seats=None, rooms=None):
+    """Group sections of the same course meeting at the same class time that
+    share no students, so the whole course sits its final together.
+    With rooms (see rooms.Rooms) every group's sections fit the rooms at once (seats[c] per section)"""
+    graph = enrollment.conflictGraph()
+    groups = np.arange(len(enrollment))
+    # KEY: (Course name, class time code)
+    # VALUE: Groups so far, each a list of course ids
+    found = {}
+    # Seats of each section of each group so far, by its first course id
+    load = {}
+    for c in range(len(enrollment)):
+        neighbors = set(graph.neighbors(c).tolist())
+        candidates = found.setdefault((str(enrollment.names[c]), int(enrollment.times[c])), [])
+        need = [int(seats[c])] if seats is not None and seats[c] else []
+        for group in candidates:
+            if rooms is not None and need and not rooms.fits(load[group[0]] + need):
+                continue
+            if not neighbors.intersection(group):
+                group.append(c)
+                groups[c] = group[0]
+                load[group[0]] += need
+                break
+        else:
+            candidates.append([c])
+            load[c] = need
+    return np.unique(groups, return_inverse=True)[1]
+
+def dominatedGroups(enrollment, instructors=None, seats=None, rooms=None):
+    """Group every section with one whose conflicts include all of its own.
+    If N(a) is a subset of N(b) and a, b share no students, a can always go in
+    b's slot without adding a conflict, so they are scheduled as one node.
+    Sections without conflicts all go together. instructors[c] are the
+    instructor ids of section c, groups never share an instructor, and with
+    rooms every group's sections fit them at once (seats[c] are the section
+    headcounts of node c).
+    Sections left out of a group by either rule start a group of their own"""
+    graph = enrollment.conflictGraph()
+    n = len(enrollment)
+    parent = np.arange(n)
+    # Instructors of each group, kept at its root
+    taught = [set(instructors[c]) if instructors is not None else set() for c in range(n)]
+    # Section headcounts of each group, kept at its root
+    load = [[] if seats is None else [int(s) for s in seats[c] if s] for c in range(n)]
+
+    def root(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    def join(a, b):
+        """Put a's group into b's, False if they share an instructor or need too many seats"""
+        a, b = root(a), root(b)
+        if a == b or taught[a] & taught[b]:
+            return False
+        if rooms is not None and load[a] and load[b] and not rooms.fits(load[a] + load[b]):
+            return False
+        parent[a] = b
+        taught[b] |= taught[a]
+        load[b] += load[a]
+        return True
+
+    neighbors = [set(graph.neighbors(c).tolist()) for c in range(n)]
+    # Sections without conflicts go into the first of their groups that takes them
+    isolated = []
+    for c in range(n):
+        if not neighbors[c] and not any(join(c, group) for group in isolated):
+            isolated.append(c)
+
+    # Fewest conflicts first, a dominating section has at least as many
+    for a in np.argsort(graph.degree, kind='stable'):
+        if not neighbors[a]:
+            continue
+        # A dominating section neighbors every neighbor of a, start from the smallest list
+        pivot = min(neighbors[a], key=lambda c: graph.degree[c])
+        for b in sorted(neighbors[pivot], key=lambda c: -graph.degree[c]):
+            if b == a or graph.degree[b] < graph.degree[a] or a in neighbors[b]:
+                continue
+            if neighbors[a] <= neighbors[b] and join(a, b):
+                break
+    return np.unique([root(c) for c in range(n)], return_inverse=True)[1]
+
+def mergeSections(enrollment, instructors=None, seats=None, rooms=None):
+    """Collapse same-time sections of a course, then dominated sections, into super-nodes.
+    Returns the merged enrollment and the member course ids (of enrollment) of each node.
+    instructors[c] are the instructor ids of section c, an instructor's sections of
+    different courses are never merged. With rooms (see rooms.Rooms) the sections of
+    a node always fit the rooms together, seats[c] defaults to the students of section c"""
+    if rooms is not None and seats is None:
+        seats = np.diff(enrollment.indptr)
+    merged, members = combine(enrollment, sameTimeGroups(enrollment, seats, rooms))
+    if instructors is not None:
+        instructors = [sorted({i for c in m for i in instructors[c]}) for m in members]
+    if seats is not None:
+        seats = [np.asarray(seats)[m] for m in members]
+    merged, outer = combine(merged, dominatedGroups(merged, instructors, seats, rooms))
+    return merged, [np.concatenate([members[g] for g in group]) for group in outer]
+
+def expandSchedule(schedule, merged, members, enrollment):
+    """Replace every super-node in schedule with the sections it stands for"""
+    # KEY: Super-node name
+    # VALUE: Names of its member sections
+    sections = {merged.courses[g]: [enrollment.courses[c] for c in members[g]] for g in range(len(merged))}
+    return [[section for node in slot for section in sections[node]] for slot in schedule]
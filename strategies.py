@@ -0,0 +1,13 @@
+from importlib.util import find_spec
+
+# Placement strategies selectable from the wizard. Kept apart from old_code so
+# the wizard can list them without loading numpy and pandas
+STRATEGIES = {'greedy': 'Greedy (most popular first)',
+              'dsatur': 'Graph coloring (DSatur)',
+              'welsh-powell': 'Graph coloring (Welsh-Powell)',
+              'multistart': 'Randomized greedy, best of many runs',
+              'exact': 'Exact solver (OR-Tools, slow)'}
+
+def availableStrategies():
+    """STRATEGIES that can run here, exact needs the optional OR-Tools"""
+    return {key: name for key, name in STRATEGIES.items() if key != 'exact' or find_spec('ortools') is not None}